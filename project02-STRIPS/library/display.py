@@ -13,13 +13,43 @@ class Displayable(object):
     The amount of detail is controlled by max_display_level
     """
     max_display_level = 1   # can be overridden in subclasses or instances
+    handlers = None   # event -> list of handlers; set by add_handler
 
     def display(self,level,*args,**nargs):
         """print the arguments if level is less than or equal to the
         current max_display_level.
         level is an integer.
         the other arguments are whatever arguments print can take.
+        An argument that is costly to build can be given as Lazy(fun),
+        so that it is only built if it is printed.
         """
         if level <= self.max_display_level:
             print(*args, **nargs)  ##if error you are using Python2 not Python3
 
+    def displaying(self,level):
+        """is True if display at level prints"""
+        return level <= self.max_display_level
+
+    def add_handler(self,event,handler):
+        """handler(self, **data) is called when event is emitted.
+        For searchers the events are 'expand', 'generate', 'prune' and
+        'solution', with the path as data."""
+        if self.handlers is None:
+            self.handlers = {}
+        self.handlers.setdefault(event,[]).append(handler)
+
+    def emit(self,event,**data):
+        """calls the handlers of event. Callers in inner loops check
+        self.handlers first so nothing is done when there are none."""
+        if self.handlers:
+            for handler in self.handlers.get(event,()):
+                handler(self, **data)
+
+class Lazy(object):
+    """A value for display whose string, str(fun()), is only computed
+    when it is printed, e.g., Lazy(lambda: [p.end() for p in frontier])"""
+    __slots__ = ('fun',)
+    def __init__(self, fun):
+        self.fun = fun
+    def __str__(self):
+        return str(self.fun())
@@ -0,0 +1,140 @@
+# searchALT.py - Landmark (ALT) heuristics for explicit graphs
+
+import hashlib
+import os
+import numpy as np
+from library.searchCSR import Search_problem_from_csr, csr_distances, from_explicit_graph, reversed_arrays
+
+def graph_fingerprint(problem):
+    """returns a string that identifies the arcs of a Search_problem_from_csr"""
+    sha = hashlib.sha1()
+    for array in (problem.indptr, problem.indices, problem.costs):
+        array = np.ascontiguousarray(array)
+        sha.update(array.dtype.str.encode())
+        sha.update(array.tobytes())
+    return sha.hexdigest()
+
+class Landmark_tables(object):
+    """The distances from and to a few landmark nodes of a
+    Search_problem_from_csr, which give an admissible heuristic by the
+    triangle inequality: for every landmark L, the cost from n to g is at
+    least d(L,g)-d(L,n) and at least d(n,L)-d(g,L).
+    The landmarks are chosen by farthest-point selection: each is the node
+    furthest from the landmarks already chosen. forward[i,n] is the cost
+    from landmark i to node n, and backward[i,n] is the cost from n to
+    landmark i (inf if there is no path); they are float32 arrays.
+    If cache_dir is not None, the tables are saved there as .npy files
+    named by the graph fingerprint, and later loaded memory-mapped instead
+    of being recomputed, so many queries on the same graph can share them.
+    """
+    def __init__(self, problem, num_landmarks=8, seed=0, cache_dir="alt_cache"):
+        self.problem = problem
+        self.num_landmarks = min(num_landmarks, problem.num_nodes)
+        self.seed = seed
+        self.cache_dir = cache_dir
+        self.loaded = False
+        if cache_dir is None:
+            self.build()
+        else:
+            name = f"alt_{graph_fingerprint(problem)}_{self.num_landmarks}_{seed}"
+            file_name = os.path.join(cache_dir, name)
+            if os.path.exists(file_name+"_tables.npy"):
+                self.landmarks = np.load(file_name+"_landmarks.npy")
+                tables = np.load(file_name+"_tables.npy", mmap_mode='r')
+                self.loaded = True
+            else:
+                self.build()
+                tables = np.stack([self.forward, self.backward])
+                os.makedirs(cache_dir, exist_ok=True)
+                for (suffix, array) in (("_landmarks", self.landmarks), ("_tables", tables)):
+                    temp_name = f"{file_name}{suffix}.{os.getpid()}.tmp.npy"
+                    np.save(temp_name, array)
+                    os.replace(temp_name, file_name+suffix+".npy")  # the tables last
+            (self.forward, self.backward) = (tables[0], tables[1])
+        # float32 distances are exact for integer costs below 2**24; otherwise
+        # each can be rounded by half a unit in the last place
+        self.rounding = (0 if problem.integer_costs() and np.isfinite(self.max_distance())
+                                                      and self.max_distance() < 2**24
+                         else 2**-23)
+
+    def build(self):
+        """chooses the landmarks and computes the tables"""
+        problem = self.problem
+        arrays = (problem.indptr, problem.indices, problem.costs)
+        rand = np.random.default_rng(self.seed)
+        from_random = csr_distances(*arrays, int(rand.integers(problem.num_nodes)))
+        landmarks, forward = [], []
+        nearest = np.where(np.isfinite(from_random), from_random, -1)
+        for i in range(self.num_landmarks):
+            landmark = int(np.argmax(nearest))
+            if i > 0 and nearest[landmark] <= 0:
+                break    # every node reachable is a landmark
+            landmarks.append(landmark)
+            forward.append(csr_distances(*arrays, landmark))
+            nearest = np.minimum(nearest, np.where(np.isfinite(forward[-1]), forward[-1], -1))
+        reverse = reversed_arrays(*arrays)
+        backward = [csr_distances(*reverse, landmark) for landmark in landmarks]
+        self.landmarks = np.array(landmarks)
+        self.forward = np.array(forward, dtype=np.float32)
+        self.backward = np.array(backward, dtype=np.float32)
+
+    def max_distance(self):
+        finite = [t[np.isfinite(t)] for t in (self.forward, self.backward)]
+        return max((t.max() for t in finite if t.size), default=0)
+
+    def values(self, goals):
+        """returns the array of the heuristic value of every node, a lower
+        bound on the cost to the nearest of goals (inf if no goal can be
+        reached)"""
+        result = np.full(self.problem.num_nodes, np.inf)
+        for goal in goals:
+            h = np.zeros(self.problem.num_nodes)
+            for i in range(len(self.landmarks)):
+                (forward, backward) = (self.forward[i].astype(np.float64),
+                                       self.backward[i].astype(np.float64))
+                with np.errstate(invalid='ignore'):   # inf-inf gives no bound
+                    bound = np.fmax(forward[goal] - forward
+                                      - self.rounding*(forward[goal] + forward),
+                                    backward - backward[goal]
+                                      - self.rounding*(backward + backward[goal]))
+                h = np.fmax(h, bound)
+            result = np.minimum(result, h)
+        return result
+
+    def __repr__(self):
+        return (f"Landmark_tables({len(self.landmarks)} landmarks for {self.problem.title}"
+                + (", loaded)" if self.loaded else ")"))
+
+def use_landmarks(problem, num_landmarks=8, seed=0, cache_dir="alt_cache"):
+    """sets the heuristic of problem, a Search_problem_from_csr or
+    Search_problem_from_explicit_graph, to the maximum of its heuristic
+    and the landmark heuristic for its goals, and returns the
+    Landmark_tables. The tables are kept with the problem, so after the
+    goals are changed, calling this again only recomputes the values."""
+    key = (num_landmarks, seed, cache_dir)
+    if getattr(problem, 'landmark_tables', (None,))[0] != key:
+        if isinstance(problem, Search_problem_from_csr):
+            (csr, nodes) = (problem, None)
+        else:
+            (csr, nodes) = from_explicit_graph(problem)
+        problem.landmark_tables = (key, Landmark_tables(csr, num_landmarks, seed, cache_dir),
+                                   nodes, problem.h if nodes is None else problem.hmap)
+    (key, tables, nodes, original) = problem.landmark_tables
+    if nodes is None:
+        h = tables.values(problem.goals)
+        problem.h = h if original is None else np.maximum(original, h)
+    else:
+        number = {node:i for (i,node) in enumerate(nodes)}
+        h = tables.values({number[goal] for goal in problem.goals}).tolist()
+        problem.hmap = {node:max(original.get(node,0), h[i]) for (i,node) in enumerate(nodes)}
+    return tables
+
+# from library.searchBenchmark import grid_graph
+# from library.searchMPP import SearcherMPP
+# graph = grid_graph(10**4)
+# use_landmarks(graph)
+# SearcherMPP(graph).search()
+# from library.searchCSR import load_npz, CSR_searcher
+# problem = load_npz("grid.npz")
+# use_landmarks(problem, num_landmarks=16)
+# CSR_searcher(problem).search()
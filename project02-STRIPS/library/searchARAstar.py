@@ -0,0 +1,136 @@
+# searchARAstar.py - Anytime repairing A* (ARA*) search
+
+import time
+from library.searchGeneric import AStarSearcher
+from library.searchProblem import Path
+
+class ARAStarSearcher(AStarSearcher):
+    """returns an anytime repairing A* (ARA*) searcher for a problem.
+    Successively better paths can be found by repeatedly calling search().
+    Paths are ordered by cost plus weight times the heuristic. The first
+    search uses a high weight, so a path is found quickly; each later one
+    lowers the weight by weight_step (down to 1), and reuses the search
+    effort: only the nodes whose cost was lowered since they were expanded
+    are considered again. After each path, self.bound is a bound on its
+    cost divided by the optimal cost (if the heuristic is admissible);
+    when it is 1 the path is optimal and the search stops.
+    If time_limit is not None, the search stops that many seconds after
+    the first call to search(); the best path found is then self.solution.
+    """
+    def __init__(self, problem, weight=5, weight_step=0.5, time_limit=None):
+        self.weight = weight
+        self.weight_step = weight_step
+        self.time_limit = time_limit
+        self.deadline = None
+        self.best = {}          # node -> cheapest path found to node
+        self.h = {}             # node -> heuristic value
+        self.closed = set()     # nodes expanded with the current weight
+        self.incons = set()     # closed nodes whose cost has been lowered since
+        self.goal_path = None   # cheapest path to a goal found
+        self.solution = None
+        self.bound = float("inf")
+        self.done = False
+        self.num_iterations = 0
+        super().__init__(problem)
+
+    def heuristic_value(self, node):
+        """the heuristic value of node, computed once"""
+        if node not in self.h:
+            self.h[node] = self.evaluate(node)
+        return self.h[node]
+
+    def path_value(self, path):
+        return path.cost + self.weight*self.heuristic_value(path.end())
+
+    def add_to_frontier(self, path):
+        """records path if it is the cheapest path found to its end, adding
+        it to the frontier unless its end has been expanded with the current
+        weight (then it is only reconsidered with the next weight)"""
+        node = path.end()
+        if node in self.best and self.best[node].cost <= path.cost:
+            return
+        self.best[node] = path
+        if self.problem.is_goal(node):
+            if self.goal_path is None or path.cost < self.goal_path.cost:
+                self.goal_path = path
+        if node in self.closed:
+            self.incons.add(node)
+        else:
+            super().add_to_frontier(path)
+
+    def improve_path(self):
+        """expands paths in order of weighted value while they may lead to a
+        cheaper goal than the best found. Returns False if the time limit
+        was reached."""
+        while (not self.frontier.empty() and (self.goal_path is None
+                   or self.frontier.top_value() < self.goal_path.cost)):
+            path = self.frontier.pop()
+            node = path.end()
+            if path is not self.best[node] or node in self.closed:
+                continue    # a cheaper path to node has been found
+            if self.deadline is not None and time.perf_counter() > self.deadline:
+                self.frontier.add(path, self.path_value(path))
+                return False
+            self.path = path
+            self.closed.add(node)
+            self.num_expanded += 1
+            if self.handlers:
+                self.emit('expand', path=path)
+            for arc in self.problem.neighbors(node):
+                self.add_to_frontier(Path(path, arc))
+        return True
+
+    def open_nodes(self):
+        """the nodes on the frontier and the inconsistent nodes"""
+        return {path.end() for path in self.frontier
+                if path is self.best[path.end()] and path.end() not in self.closed} | self.incons
+
+    def search(self):
+        """returns a path cheaper than the previous one returned, and sets
+        self.bound. Returns None when there is no better path or the time
+        limit has been reached."""
+        if self.deadline is None and self.time_limit is not None:
+            self.deadline = time.perf_counter() + self.time_limit
+        while not self.done:
+            self.num_iterations += 1
+            weight = self.weight
+            finished = self.improve_path()
+            open_nodes = self.open_nodes()
+            previous = self.solution
+            if self.goal_path is not None:
+                lower = min((self.best[n].cost + self.heuristic_value(n) for n in open_nodes),
+                            default=self.goal_path.cost)
+                self.bound = (min(self.weight, self.goal_path.cost/lower) if lower > 0
+                              else self.weight)
+                self.bound = max(self.bound, 1)
+                self.solution = self.goal_path
+            if not finished or self.bound == 1 or not open_nodes or self.weight == 1:
+                self.done = True
+            else:
+                self.weight = max(1, self.weight - self.weight_step)
+                frontier = type(self.frontier)()
+                frontier.max_size = self.frontier.max_size
+                self.frontier = frontier
+                self.closed = set()
+                self.incons = set()
+                for node in open_nodes:
+                    self.frontier.add(self.best[node], self.path_value(self.best[node]))
+            if self.solution is not None and self.solution is not previous:
+                self.emit('solution', path=self.solution)
+                self.display(1, f"Solution: {self.solution} (cost: {self.solution.cost})\n",
+                             self.num_expanded, "paths have been expanded;",
+                             f"weight {weight}, suboptimality bound {self.bound:.3f}")
+                return self.solution
+        self.display(0, "No (more) solutions. Total of",
+                     self.num_expanded, "paths expanded.")
+        return None
+
+# import library.searchExample
+# s = ARAStarSearcher(searchExample.simp_delivery_graph)
+# s.search()  # first path
+# s.search()  # better path, if any
+# from library.stripsForwardPlanner import Forward_STRIPS
+# from library.stripsHeuristic import delete_relaxation
+# from starcraft.starcraftProblem import problem_train_wraith, domain_train_wraith
+# s = ARAStarSearcher(Forward_STRIPS(problem_train_wraith, delete_relaxation(domain_train_wraith).h_max), time_limit=10)
+# while s.search(): print(s.bound)
@@ -0,0 +1,153 @@
+# searchBenchmark.py - Benchmarks for the searchers on large synthetic graphs
+
+import argparse
+import json
+import math
+import random
+from library.searchProblem import Arc, Search_problem_from_explicit_graph
+from library.searchGeneric import Searcher, AStarSearcher
+from library.searchMPP import SearcherMPP
+from library.searchBranchAndBound import DF_branch_and_bound
+from library.searchStats import measure
+
+def random_graph(num_nodes, edges_per_node=2, seed=0):
+    """returns a random geometric graph: the nodes 0..num_nodes-1 are at
+    random points in the unit square, and each is joined (in both directions)
+    to edges_per_node others chosen from nearby points. The cost of an arc
+    is the distance between its ends (so the straight-line distance to the
+    goal is an admissible heuristic). The start is node 0 and the goal is
+    the node furthest from it."""
+    rand = random.Random(seed)
+    positions = {n:(rand.random(), rand.random()) for n in range(num_nodes)}
+    cells_per_side = max(1, int(math.sqrt(num_nodes/4)))    # about 4 points per cell
+    cells = {}
+    for (n,(x,y)) in positions.items():
+        cells.setdefault((int(x*cells_per_side), int(y*cells_per_side)), []).append(n)
+    arcs = []
+    for (n,(x,y)) in positions.items():
+        (cx,cy) = (int(x*cells_per_side), int(y*cells_per_side))
+        nearby = [m for dx in (-1,0,1) for dy in (-1,0,1)
+                    for m in cells.get((cx+dx,cy+dy),()) if m != n]
+        for m in rand.sample(nearby, min(edges_per_node, len(nearby))):
+            cost = math.dist(positions[n], positions[m])
+            arcs.append(Arc(n, m, cost))
+            arcs.append(Arc(m, n, cost))
+    start = 0
+    goal = max(positions, key=lambda n: math.dist(positions[n], positions[start]))
+    hmap = {n:math.dist(pos, positions[goal]) for (n,pos) in positions.items()}
+    return Search_problem_from_explicit_graph(f"random graph {num_nodes} seed {seed}",
+                range(num_nodes), arcs, start, {goal}, hmap, positions)
+
+def grid_graph(num_nodes, obstacles=0.2, seed=0):
+    """returns a square 4-connected grid with about num_nodes cells, of
+    which a fraction obstacles (chosen at random) are blocked. The nodes
+    are (x,y) pairs and every arc costs 1; the heuristic is the Manhattan
+    distance. The start and goal are opposite corners."""
+    rand = random.Random(seed)
+    side = max(2, int(math.sqrt(num_nodes)))
+    start, goal = (0,0), (side-1,side-1)
+    free = {(x,y) for x in range(side) for y in range(side)
+                  if rand.random() >= obstacles or (x,y) in (start,goal)}
+    arcs = [Arc((x,y), (x+dx,y+dy), 1)
+            for (x,y) in free
+            for (dx,dy) in ((1,0),(-1,0),(0,1),(0,-1))
+            if (x+dx,y+dy) in free]
+    hmap = {(x,y):abs(goal[0]-x)+abs(goal[1]-y) for (x,y) in free}
+    positions = {node:node for node in free}
+    return Search_problem_from_explicit_graph(f"grid {side}x{side} seed {seed}",
+                free, arcs, start, {goal}, hmap, positions)
+
+workloads = {'random': random_graph, 'grid': grid_graph}
+
+def with_pruning(searcher_class):
+    """returns a function that makes a depth-first searcher_class for a
+    problem with cycle pruning and a transposition table for every node,
+    so that it stops on the cyclic workloads"""
+    def make(problem):
+        return searcher_class(problem, cycle_pruning=True,
+                              max_transpositions=len(problem.neighs))
+    return make
+
+searchers = {'Searcher': with_pruning(Searcher), 'AStarSearcher': AStarSearcher,
+             'SearcherMPP': SearcherMPP, 'DF_branch_and_bound': with_pruning(DF_branch_and_bound)}
+# the largest size a searcher is run on: the depth-first searchers
+# expand millions of paths on larger graphs, even with pruning
+max_sizes = {'Searcher': 10**3, 'DF_branch_and_bound': 10**3}
+
+def run_benchmarks(sizes=(10**3, 10**4, 10**5), seed=0, workload_names=workloads,
+                   searcher_names=searchers, max_expansions=10**5, trace_memory=False):
+    """runs each searcher on each workload of each size, and returns a list
+    of results, one dictionary per run with the workload and the
+    Search_stats. A searcher is not run on sizes above its max_sizes.
+    Searches stop after max_expansions; completed is False for them."""
+    results = []
+    for name in workload_names:
+        for size in sizes:
+            problem = workloads[name](size, seed=seed)
+            for searcher_name in searcher_names:
+                if size > max_sizes.get(searcher_name, size):
+                    print(f"{name:8} {size:8} {searcher_name:20} skipped (too large)")
+                    continue
+                searcher = searchers[searcher_name](problem)
+                searcher.max_display_level = 0
+                stats = measure(searcher, timing=False, trace_memory=trace_memory,
+                                max_expansions=max_expansions)
+                result = {'workload': name, 'size': size, 'seed': seed,
+                          'nodes': len(problem.neighs), 'arcs': len(problem.arcs)}
+                result.update(stats.as_dict())
+                results.append(result)
+                print(f"{name:8} {size:8} {searcher_name:20} expanded {stats.expanded:8}",
+                      f"cost {stats.solution_cost} in {stats.search_time:.3f}s"
+                      + ("" if stats.completed else " (stopped)"))
+    return results
+
+def compare(results, baseline, tolerance=0.25, min_time=0.05):
+    """returns a list of the regressions of results from baseline (both
+    lists of results): a run whose expansions or solution cost changed, or
+    whose time grew by more than the fraction tolerance (and min_time seconds)"""
+    key = lambda r: (r['workload'], r['size'], r['seed'], r['searcher'])
+    base = {key(r):r for r in baseline}
+    regressions = []
+    for r in results:
+        b = base.get(key(r))
+        if b is None:
+            continue
+        name = "{} {} seed {} {}".format(*key(r))
+        if (r['expanded'], r['solution_cost']) != (b['expanded'], b['solution_cost']):
+            regressions.append(f"{name}: expanded {r['expanded']} (was {b['expanded']}),"
+                               f" cost {r['solution_cost']} (was {b['solution_cost']})")
+        if r['search_time'] > b['search_time']*(1+tolerance) + min_time:
+            regressions.append(f"{name}: {r['search_time']:.3f}s (was {b['search_time']:.3f}s)")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the searchers on synthetic graphs")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10**3, 10**4, 10**5])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workloads", nargs="+", default=list(workloads), choices=list(workloads))
+    parser.add_argument("--searchers", nargs="+", default=list(searchers), choices=list(searchers))
+    parser.add_argument("--max-expansions", type=int, default=10**5)
+    parser.add_argument("--trace-memory", action="store_true")
+    parser.add_argument("--results", default="benchmark_results.json")
+    parser.add_argument("--baseline", help="results file to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+    results = run_benchmarks(args.sizes, args.seed, args.workloads, args.searchers,
+                             args.max_expansions, args.trace_memory)
+    with open(args.results, "w") as f:
+        json.dump(results, f, indent=1)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print("REGRESSION", regression)
+        if regressions:
+            raise SystemExit(1)
+        print("No regressions from", args.baseline)
+
+if __name__ == "__main__":
+    main()
+
+# python -m library.searchBenchmark --sizes 1000 10000 --results baseline.json
+# python -m library.searchBenchmark --sizes 1000 10000 --baseline baseline.json
+# python -m library.searchBenchmark --sizes 1000000 --workloads grid --searchers SearcherMPP
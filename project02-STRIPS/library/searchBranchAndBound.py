@@ -10,18 +10,19 @@
 
 from library.searchProblem import Path
 from library.searchGeneric import Searcher
-from library.display import Displayable
+from library.display import Displayable, Lazy
 
 class DF_branch_and_bound(Searcher):
     """returns a branch and bound searcher for a problem.    
     An optimal path with cost less than bound can be found by calling search()
     """
-    def __init__(self, problem, bound=float("inf")):
+    def __init__(self, problem, bound=float("inf"), cycle_pruning=False, max_transpositions=0):
         """creates a searcher than can be used with search() to find an optimal path.
         bound gives the initial bound. By default this is infinite - meaning there
         is no initial pruning due to depth bound
+        cycle_pruning and max_transpositions are as for Searcher.
         """
-        super().__init__(problem)
+        super().__init__(problem, cycle_pruning, max_transpositions)
         self.best_path = None
         self.bound = bound
 
@@ -30,22 +31,39 @@ class DF_branch_and_bound(Searcher):
         returns None if there is no solution with cost less than bound."""
         self.frontier = [Path(self.problem.start_node())]
         self.num_expanded = 0
+        self.num_generated = 1    # the start path
+        self.num_pruned = 0
+        self.max_frontier = 0
+        self.best_cost = {}
+        self.current, self.on_path = [], set()
         while self.frontier:
-            self.path = self.frontier.pop()
+            self.path = self.pop_from_frontier()
             if self.path.cost+self.problem.heuristic(self.path.end()) < self.bound:
-                # if self.path.end() not in self.path.initial_nodes():  # for cycle pruning
+                if (self.cycle_pruning or self.max_transpositions) and self.pruned(self.path):
+                    self.num_pruned += 1
+                    if self.handlers:
+                        self.emit('prune', path=self.path)
+                    continue
                 self.display(2,"Expanding:",self.path,"cost:",self.path.cost)
                 self.num_expanded += 1
                 if self.problem.is_goal(self.path.end()):
                     self.best_path = self.path
                     self.bound = self.path.cost
+                    self.emit('solution', path=self.path)
                     self.display(1,"New best path:",self.path," cost:",self.path.cost)
                 else:
+                    if self.handlers:
+                        self.emit('expand', path=self.path)
+                    self.expanding(self.path)
                     neighs = self.problem.neighbors(self.path.end())
                     self.display(4,"Neighbors are", neighs)
                     for arc in reversed(list(neighs)):
                         self.add_to_frontier(Path(self.path, arc))
-                    self.display(3, f"New frontier: {[p.end() for p in self.frontier]}")
+                    if len(self.frontier) > self.max_frontier:
+                        self.max_frontier = len(self.frontier)
+                    self.display(3, Lazy(lambda: f"New frontier: {[p.end() for p in self.frontier]}"))
+            elif self.handlers:
+                self.emit('prune', path=self.path)
         self.path = self.best_path
         self.solution = self.best_path
         self.display(1,f"Optimal solution is {self.best_path}." if self.best_path
@@ -63,6 +81,8 @@ class DF_branch_and_bound(Searcher):
 # searcherb1.search()        # find optimal path
 # searcherb2 = DF_branch_and_bound(searchExample.cyclic_simp_delivery_graph, bound=100)
 # searcherb2.search()        # find optimal path
+# DF_branch_and_bound(searchExample.cyclic_simp_delivery_graph, cycle_pruning=True).search()
+# DF_branch_and_bound(searchExample.cyclic_simp_delivery_graph, max_transpositions=1000).search()
 
 # to use the GUI do:
 # ipython -i searchGUI.py
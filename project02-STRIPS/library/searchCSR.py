@@ -0,0 +1,290 @@
+# searchCSR.py - Explicit graphs in compressed sparse row form, with NumPy
+
+import heapq
+import struct
+import zipfile
+import numpy as np
+from library.display import Displayable
+from library.searchProblem import Arc, Path, Search_problem, Search_problem_from_explicit_graph
+
+class Search_problem_from_csr(Search_problem):
+    """A search problem from an explicit graph whose nodes are the integers
+    0..num_nodes-1, with the arcs in compressed sparse row (CSR) form:
+    the arcs from node n are to indices[indptr[n]:indptr[n+1]], with
+    costs costs[indptr[n]:indptr[n+1]]. The arrays can be memory-mapped.
+    * start is the start node
+    * goals is a set of goal nodes
+    * h is an array of the heuristic value of each node, or None for 0
+    * positions is an array of (x,y) positions; None for random
+      positions, chosen when the graph is first shown
+    neighbors() makes Arcs for the generic searchers; CSR_searcher
+    searches the arrays directly.
+    """
+    def __init__(self, title, indptr, indices, costs, start=0, goals=set(),
+                 h=None, positions=None):
+        self.title = title
+        self.indptr = indptr
+        self.indices = indices
+        self.costs = costs
+        self.num_nodes = len(indptr)-1
+        self.start = start
+        self.goals = goals
+        self.h = h
+        self.positions = positions
+
+    def start_node(self):
+        """returns start node"""
+        return self.start
+
+    def is_goal(self,node):
+        """is True if node is a goal"""
+        return node in self.goals
+
+    def neighbors(self,node):
+        """returns the list of arcs from node"""
+        (first, last) = (self.indptr[node], self.indptr[node+1])
+        return [Arc(node, to_node, cost)
+                for (to_node, cost) in zip(self.indices[first:last].tolist(),
+                                           self.costs[first:last].tolist())]
+
+    def heuristic(self,node):
+        """the heuristic value of node (0 if there is no h array)"""
+        return 0 if self.h is None else self.h[node].item()
+
+    def integer_costs(self):
+        """is True if the costs are stored as integers"""
+        return self.costs.dtype.kind in 'iu'
+
+    def num_arcs(self):
+        return len(self.indices)
+
+    def to_explicit_graph(self):
+        """returns the Search_problem_from_explicit_graph with the same arcs
+        (only sensible for small graphs)"""
+        nodes = list(range(self.num_nodes))
+        arcs = [arc for node in nodes for arc in self.neighbors(node)]
+        hmap = {} if self.h is None else dict(enumerate(self.h.tolist()))
+        positions = (None if self.positions is None
+                     else {n:tuple(pos) for (n,pos) in enumerate(self.positions.tolist())})
+        return Search_problem_from_explicit_graph(self.title, nodes, arcs,
+                    self.start, self.goals, hmap, positions)
+
+    def show(self, fontsize=10, node_color='orange', show_costs=True):
+        """Show the graph as a figure (only sensible for small graphs)"""
+        graph = self.to_explicit_graph()
+        graph.show(fontsize, node_color, show_costs)
+        self.positions = np.array([graph.positions[n] for n in range(self.num_nodes)])
+
+    def __repr__(self):
+        return f"Search_problem_from_csr({self.title}: {self.num_nodes} nodes, {self.num_arcs()} arcs)"
+
+def csr_arrays(sources, targets, costs, num_nodes=None):
+    """returns (indptr, indices, costs) for the arcs sources[i]->targets[i]
+    with costs[i]"""
+    sources = np.asarray(sources, dtype=np.int64)
+    if num_nodes is None:
+        num_nodes = int(max(sources.max(initial=-1), np.max(targets, initial=-1)))+1
+    order = np.argsort(sources, kind='stable')
+    indptr = np.zeros(num_nodes+1, dtype=np.int64)
+    np.cumsum(np.bincount(sources, minlength=num_nodes), out=indptr[1:])
+    return (indptr, np.asarray(targets)[order], np.asarray(costs)[order])
+
+def reversed_arrays(indptr, indices, costs):
+    """returns the CSR arrays (indptr, indices, costs) of the graph with
+    every arc reversed"""
+    sources = np.repeat(np.arange(len(indptr)-1), np.diff(indptr))
+    return csr_arrays(indices, sources, costs, len(indptr)-1)
+
+def csr_distances(indptr, indices, costs, source):
+    """returns the array of the costs of the cheapest paths from source to
+    each node (inf if there is none), by Dijkstra's algorithm"""
+    (indptr, indices, costs) = (np.asarray(indptr), np.asarray(indices), np.asarray(costs))
+    dist = np.full(len(indptr)-1, np.inf)
+    closed = bytearray(len(indptr)-1)
+    dist[source] = 0
+    frontier = [(0.0, source)]
+    while frontier:
+        (g, node) = heapq.heappop(frontier)
+        if closed[node]:
+            continue
+        closed[node] = 1
+        (first, last) = (indptr[node], indptr[node+1])
+        for (to_node, cost) in zip(indices[first:last].tolist(), costs[first:last].tolist()):
+            d = g + cost
+            if d < dist[to_node]:
+                dist[to_node] = d
+                heapq.heappush(frontier, (d, to_node))
+    return dist
+
+def from_explicit_graph(graph):
+    """returns the Search_problem_from_csr for a Search_problem_from_explicit_graph,
+    and the list of its nodes (node number i is nodes[i])"""
+    nodes = list(graph.neighs)
+    number = {node:i for (i,node) in enumerate(nodes)}
+    arcs = graph.arcs
+    costs = [arc.cost for arc in arcs]
+    dtype = np.int64 if all(isinstance(c, int) for c in costs) else np.float64
+    (indptr, indices, costs) = csr_arrays([number[arc.from_node] for arc in arcs],
+                                          [number[arc.to_node] for arc in arcs],
+                                          np.array(costs, dtype=dtype), len(nodes))
+    h = np.array([graph.heuristic(node) for node in nodes], dtype=np.float64)
+    positions = (None if graph.positions is None
+                 else np.array([graph.positions[node] for node in nodes], dtype=np.float64))
+    goals = {number[g] for g in graph.goals}
+    return (Search_problem_from_csr(graph.title, indptr, indices, costs, number[graph.start],
+                                    goals, h, positions), nodes)
+
+def load_edge_list(file_name, start=0, goals=set(), num_nodes=None, undirected=False):
+    """returns the Search_problem_from_csr from a text file with a line
+    "from to cost" for each arc (or "from to" on every line, for cost 1).
+    If undirected is True, each line gives arcs both ways."""
+    data = np.loadtxt(file_name, ndmin=2, comments='#')
+    sources = data[:,0].astype(np.int64)
+    targets = data[:,1].astype(np.int64)
+    costs = data[:,2] if data.shape[1] > 2 else np.ones(len(data), dtype=np.int64)
+    if costs.dtype.kind == 'f' and np.all(costs == np.round(costs)):
+        costs = costs.astype(np.int64)
+    if undirected:
+        (sources, targets, costs) = (np.concatenate([sources, targets]),
+                                     np.concatenate([targets, sources]),
+                                     np.concatenate([costs, costs]))
+    (indptr, indices, costs) = csr_arrays(sources, targets, costs, num_nodes)
+    return Search_problem_from_csr(file_name, indptr, indices, costs, start, goals)
+
+def save_npz(problem, file_name):
+    """saves the arrays of problem (and the start and goals) to file_name,
+    uncompressed so that load_npz can memory-map them"""
+    arrays = {'indptr': problem.indptr, 'indices': problem.indices, 'costs': problem.costs,
+              'start': np.array(problem.start),
+              'goals': np.array(sorted(problem.goals), dtype=np.int64)}
+    if problem.h is not None:
+        arrays['h'] = problem.h
+    if problem.positions is not None:
+        arrays['positions'] = problem.positions
+    np.savez(file_name, **arrays)
+
+def load_npz(file_name, mmap=True):
+    """returns the Search_problem_from_csr saved by save_npz. If mmap is
+    True the arrays are memory-mapped from the file (which must not be
+    compressed), so only the parts used are read."""
+    arrays = npz_arrays(file_name) if mmap else dict(np.load(file_name))
+    return Search_problem_from_csr(file_name, arrays['indptr'], arrays['indices'],
+                arrays['costs'], int(arrays['start']), set(arrays['goals'].tolist()),
+                arrays.get('h'), arrays.get('positions'))
+
+def npz_arrays(file_name):
+    """returns a dictionary of the arrays in an uncompressed .npz file,
+    memory-mapped (np.load does not memory-map .npz files)"""
+    arrays = {}
+    with zipfile.ZipFile(file_name) as archive, open(file_name, 'rb') as f:
+        for info in archive.infolist():
+            if info.compress_type != zipfile.ZIP_STORED:
+                raise ValueError(f"{file_name} is compressed; use load_npz(..., mmap=False)")
+            f.seek(info.header_offset)
+            local_header = f.read(30)
+            (name_length, extra_length) = struct.unpack('<HH', local_header[26:30])
+            f.seek(info.header_offset + 30 + name_length + extra_length)
+            version = np.lib.format.read_magic(f)
+            if version == (1,0):
+                (shape, fortran_order, dtype) = np.lib.format.read_array_header_1_0(f)
+            else:
+                (shape, fortran_order, dtype) = np.lib.format.read_array_header_2_0(f)
+            name = info.filename[:-4] if info.filename.endswith('.npy') else info.filename
+            if shape == ():
+                arrays[name] = np.fromfile(f, dtype=dtype, count=1).reshape(())
+            else:
+                arrays[name] = np.memmap(file_name, dtype=dtype, mode='r', offset=f.tell(),
+                                         shape=shape, order='F' if fortran_order else 'C')
+    return arrays
+
+class CSR_searcher(Displayable):
+    """A* search (Dijkstra's algorithm if use_h is False or there is no h)
+    on a Search_problem_from_csr, using the node numbers and arrays of
+    costs and parents rather than Paths and Arcs. The arcs of a node with
+    more than vector_degree arcs are relaxed together with NumPy; for
+    fewer, a Python loop over the arrays' slices is faster. The heuristic
+    must be consistent for the path found to be optimal. search() returns
+    the optimal Path (the only Path built) or None.
+    """
+    vector_degree = 32
+
+    def __init__(self, problem, use_h=True):
+        self.problem = problem
+        self.use_h = use_h and problem.h is not None
+        self.num_expanded = 0
+        self.solution = None
+
+    def search(self):
+        problem = self.problem
+        # plain ndarray views of memory-mapped arrays are faster to slice
+        (indptr, indices, costs) = (np.asarray(problem.indptr), np.asarray(problem.indices),
+                                    np.asarray(problem.costs))
+        h = np.asarray(problem.h, dtype=np.float64) if self.use_h else np.zeros(problem.num_nodes)
+        goals = problem.goals
+        dist = np.full(problem.num_nodes, np.inf)
+        parent = np.full(problem.num_nodes, -1, dtype=np.int64)
+        closed = bytearray(problem.num_nodes)
+        start = problem.start
+        dist[start] = 0
+        frontier = [(h[start].item(), 0.0, start)]   # (f, -g, node): deepest first amongst ties
+        self.num_expanded = 0
+        while frontier:
+            (_, neg_g, node) = heapq.heappop(frontier)
+            if closed[node]:
+                continue
+            closed[node] = 1
+            self.num_expanded += 1
+            if node in goals:
+                self.solution = self.path_to(node, parent)
+                self.display(1, f"Solution: {self.solution} (cost: {self.solution.cost})\n",
+                             self.num_expanded, "nodes have been expanded")
+                return self.solution
+            g = -neg_g
+            (first, last) = (indptr[node], indptr[node+1])
+            to_nodes = indices[first:last]
+            if last-first > self.vector_degree:
+                new_dist = g + costs[first:last]
+                # keep the cheapest of parallel arcs to the same node
+                order = np.lexsort((new_dist, to_nodes))
+                (to_nodes, new_dist) = (to_nodes[order], new_dist[order])
+                cheapest = np.unique(to_nodes, return_index=True)[1]
+                (to_nodes, new_dist) = (to_nodes[cheapest], new_dist[cheapest])
+                better = new_dist < dist[to_nodes]
+                to_nodes = to_nodes[better]
+                new_dist = new_dist[better]
+                dist[to_nodes] = new_dist
+                parent[to_nodes] = node
+                for (value, d, to_node) in zip((new_dist + h[to_nodes]).tolist(),
+                                               new_dist.tolist(), to_nodes.tolist()):
+                    heapq.heappush(frontier, (value, -d, to_node))
+            else:
+                for (to_node, cost, to_h) in zip(to_nodes.tolist(), costs[first:last].tolist(),
+                                                 h[to_nodes].tolist()):
+                    d = g + cost
+                    if d < dist[to_node]:
+                        dist[to_node] = d
+                        parent[to_node] = node
+                        heapq.heappush(frontier, (d + to_h, -d, to_node))
+        self.display(0, "No solution. Total of", self.num_expanded, "nodes expanded.")
+        return None
+
+    def path_to(self, node, parent):
+        """returns the Path to node following parent"""
+        problem = self.problem
+        nodes = [node]
+        while parent[nodes[-1]] >= 0:
+            nodes.append(int(parent[nodes[-1]]))
+        nodes.reverse()
+        path = Path(nodes[0])
+        for (from_node, to_node) in zip(nodes, nodes[1:]):
+            (first, last) = (problem.indptr[from_node], problem.indptr[from_node+1])
+            arc_costs = np.asarray(problem.costs[first:last])
+            cost = arc_costs[np.asarray(problem.indices[first:last]) == to_node].min().item()
+            path = Path(path, Arc(from_node, to_node, cost))
+        return path
+
+# from library.searchBenchmark import grid_graph
+# (problem, nodes) = from_explicit_graph(grid_graph(10**6))
+# save_npz(problem, "grid.npz")
+# problem = load_npz("grid.npz")    # memory-mapped
+# CSR_searcher(problem).search()
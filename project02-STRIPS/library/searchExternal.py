@@ -0,0 +1,281 @@
+# searchExternal.py - External-memory A* for planning problems, with states on disk
+
+import hashlib
+import json
+import os
+import numpy as np
+from library.display import Displayable
+from library.searchProblem import Arc, Path
+from library.searchStats import Search_stats
+from library.stripsProblem import domain_fingerprint
+
+class External_AStar(Displayable):
+    """An A* searcher for a Forward_STRIPS problem with compact=True that
+    keeps the frontier and the explored states on disk, in directory.
+    The frontier is a layer file for each f-value; the layer with the
+    lowest f is read chunk_size states at a time. Duplicates are removed
+    by delayed duplicate detection: each chunk is sorted, and the states
+    in it that are in the sorted files of the explored states are dropped.
+    Only a chunk and the children generated from it are in memory.
+    As for SearcherMPP, a state is expanded at most once, so the path
+    found is optimal if the heuristic is consistent.
+    After each chunk, a manifest of the files is written, so an
+    interrupted search can be resumed with resume=True.
+    """
+    def __init__(self, problem, directory="external_search", chunk_size=10**5, resume=False):
+        if not getattr(problem, 'compact', False):
+            raise ValueError("External_AStar needs a Forward_STRIPS problem with compact=True")
+        self.problem = problem
+        self.directory = directory
+        self.chunk_size = chunk_size
+        self.encoding = enc = problem.encoding
+        self.action_index = {act:i for (i,act) in enumerate(enc.actions)}
+        num_codes = max(len(values) for values in enc.values)
+        code_type = np.uint8 if num_codes <= 2**8 else np.uint16 if num_codes <= 2**16 else np.int32
+        self.row_type = np.dtype([('state', code_type, (len(enc.features),)), ('g', np.float64),
+                                  ('action', np.int32), ('parent_file', np.int32),
+                                  ('parent_row', np.int64)])
+        self.key_type = np.dtype((np.void, self.row_type['state'].itemsize))
+        self.fingerprint = hashlib.sha1(repr((domain_fingerprint(problem.prob_domain),
+                [list(map(repr, values)) for values in enc.values],
+                problem.initial_state.values, problem.goal_codes)).encode()).hexdigest()
+        self.solution = None
+        self.peak_chunk = 0
+        os.makedirs(directory, exist_ok=True)
+        if resume and os.path.exists(self.file("manifest.json")):
+            self.load_manifest()
+        else:
+            self.start_search()
+
+    def file(self, name):
+        return os.path.join(self.directory, name)
+
+    def new_file_name(self, kind):
+        self.next_file += 1
+        return f"{kind}_{self.next_file}.bin"
+
+    def start_search(self):
+        for name in os.listdir(self.directory):
+            if name.endswith(".bin"):
+                os.remove(self.file(name))
+        self.next_file = 0
+        self.layers = {}     # f -> [file name, first unread row, number of rows]
+        self.closed = []     # explored state files (their index is parent_file)
+        self.index = []      # [file name, number of keys] sorted keys of explored states
+        self.num_expanded = self.num_generated = self.num_duplicates = 0
+        start = self.problem.start_node()
+        row = np.array([(start.values, 0, -1, -1, -1)], dtype=self.row_type)
+        self.append_rows({self.problem.heuristic(start): [row]})
+        self.save_manifest()
+
+    def save_manifest(self):
+        manifest = {'fingerprint': self.fingerprint, 'next_file': self.next_file,
+                    'layers': [[f]+layer for (f, layer) in self.layers.items()],
+                    'closed': self.closed, 'index': self.index,
+                    'expanded': self.num_expanded, 'generated': self.num_generated,
+                    'duplicates': self.num_duplicates}
+        temp_name = self.file(f"manifest.{os.getpid()}.tmp")
+        with open(temp_name, "w") as f:
+            json.dump(manifest, f)
+        os.replace(temp_name, self.file("manifest.json"))   # never a partial manifest
+
+    def load_manifest(self):
+        """restores the search from the manifest, discarding the work
+        done after it was written"""
+        with open(self.file("manifest.json")) as f:
+            manifest = json.load(f)
+        if manifest['fingerprint'] != self.fingerprint:
+            raise ValueError(f"{self.directory} holds a search of a different problem")
+        self.next_file = manifest['next_file']
+        self.layers = {f:[name, first, rows] for (f, name, first, rows) in manifest['layers']}
+        self.closed = manifest['closed']
+        self.index = manifest['index']
+        self.num_expanded = manifest['expanded']
+        self.num_generated = manifest['generated']
+        self.num_duplicates = manifest['duplicates']
+        for (name, first, rows) in self.layers.values():
+            with open(self.file(name), "r+b") as f:
+                f.truncate(rows*self.row_type.itemsize)
+        self.remove_unused_files()
+        self.display(1, "Resumed search with", self.num_expanded, "states expanded")
+
+    def remove_unused_files(self):
+        used = ({name for (name, first, rows) in self.layers.values()}
+                | set(self.closed) | {name for (name, size) in self.index})
+        for name in os.listdir(self.directory):
+            if name.endswith(".bin") and name not in used:
+                os.remove(self.file(name))
+
+    def read(self, name, dtype, first=0, last=None):
+        """returns rows first..last-1 of file name as an array in memory"""
+        if os.path.getsize(self.file(name)) == 0:
+            return np.zeros(0, dtype=dtype)
+        return np.array(np.memmap(self.file(name), dtype=dtype, mode='r')[first:last])
+
+    def append_rows(self, children):
+        """appends children, an f:list of arrays of rows dictionary, to the layer files"""
+        for (f, arrays) in children.items():
+            if f not in self.layers:
+                self.layers[f] = [self.new_file_name("layer"), 0, 0]
+            layer = self.layers[f]
+            rows = np.concatenate(arrays)
+            with open(self.file(layer[0]), "ab") as file:
+                file.write(rows.tobytes())
+            layer[2] += len(rows)
+
+    def keys(self, rows):
+        """the states of rows as byte strings, which can be sorted"""
+        return np.ascontiguousarray(rows['state']).view(self.key_type).ravel()
+
+    def explored(self, keys):
+        """returns a boolean array of which of the sorted keys are of explored states"""
+        found = np.zeros(len(keys), dtype=bool)
+        for (name, size) in self.index:
+            index = np.memmap(self.file(name), dtype=self.key_type, mode='r')
+            pos = np.searchsorted(index, keys).clip(max=size-1)
+            found |= np.asarray(index[pos]) == keys
+        return found
+
+    def add_to_index(self, keys):
+        """adds the sorted keys of newly explored states; index files of
+        similar size are merged, so there are few of them"""
+        name = self.new_file_name("index")
+        keys.tofile(self.file(name))
+        self.index.append([name, len(keys)])
+        while len(self.index) > 1 and self.index[-1][1]*2 >= self.index[-2][1]:
+            (second, last) = (self.index[-2], self.index.pop())
+            name = self.new_file_name("index")
+            self.merge(second[0], last[0], name)
+            self.index[-1] = [name, second[1]+last[1]]
+
+    def merge(self, name1, name2, out_name):
+        """merges two sorted key files into out_name, chunk_size keys at a time"""
+        (a, b) = (np.memmap(self.file(name1), dtype=self.key_type, mode='r'),
+                  np.memmap(self.file(name2), dtype=self.key_type, mode='r'))
+        (i, j) = (0, 0)
+        with open(self.file(out_name), "wb") as out:
+            while i < len(a) and j < len(b):
+                (chunk_a, chunk_b) = (a[i:i+self.chunk_size], b[j:j+self.chunk_size])
+                cut = min(chunk_a[-1], chunk_b[-1], key=bytes)
+                (na, nb) = (np.searchsorted(chunk_a, cut, 'right'), np.searchsorted(chunk_b, cut, 'right'))
+                out.write(np.sort(np.concatenate([chunk_a[:na], chunk_b[:nb]])).tobytes())
+                (i, j) = (i+na, j+nb)
+            for (rest, k) in ((a, i), (b, j)):
+                for first in range(k, len(rest), self.chunk_size):
+                    out.write(np.asarray(rest[first:first+self.chunk_size]).tobytes())
+
+    def search(self, max_expansions=None):
+        """returns a cheapest path to a goal, or None if there is none.
+        If max_expansions is not None, the search stops (returning None)
+        after about that many expansions; it can be continued by calling
+        search() again, or from its files by a new External_AStar with
+        resume=True."""
+        stop_at = None if max_expansions is None else self.num_expanded + max_expansions
+        while self.layers:
+            if stop_at is not None and self.num_expanded >= stop_at:
+                self.display(1, "Stopped after", self.num_expanded, "expansions")
+                return None
+            f = min(self.layers)
+            (name, first, rows) = self.layers[f]
+            last = min(rows, first+self.chunk_size)
+            chunk = self.read(name, self.row_type, first, last)
+            self.layers[f][1] = last
+            # remove duplicates, keeping the cheapest path to each state
+            chunk = chunk[np.argsort(chunk['g'], kind='stable')]
+            (keys, unique) = np.unique(self.keys(chunk), return_index=True)
+            new = ~self.explored(keys)
+            (chunk, keys) = (chunk[unique][new], keys[new])
+            self.num_duplicates += last-first-len(chunk)
+            self.peak_chunk = max(self.peak_chunk, len(chunk))
+            if len(chunk):
+                self.closed.append(self.new_file_name("closed"))
+                chunk.tofile(self.file(self.closed[-1]))
+                self.add_to_index(keys)
+                is_goal = np.ones(len(chunk), dtype=bool)
+                for (i, code) in self.problem.goal_codes:
+                    is_goal &= chunk['state'][:, i] == code
+                if is_goal.any():
+                    self.solution = self.path_to(len(self.closed)-1, int(np.flatnonzero(is_goal)[0]))
+                    self.save_manifest()
+                    self.display(1, f"Solution: {self.solution} (cost: {self.solution.cost})\n",
+                                 self.num_expanded, "states expanded;", self.num_duplicates,
+                                 "duplicates removed")
+                    return self.solution
+                self.expand(chunk, len(self.closed)-1)
+            if self.layers[f][1] == self.layers[f][2]:
+                del self.layers[f]
+                self.display(2, f"Finished layer f={f}:", self.num_expanded, "states expanded")
+            self.save_manifest()
+            self.remove_unused_files()
+        self.display(0, "No solution. Total of", self.num_expanded, "states expanded.")
+        return None
+
+    def expand(self, chunk, file_number):
+        """adds the children of the states in chunk (from closed file
+        file_number) to the layer files"""
+        enc = self.encoding
+        children = {}   # values -> (g, action index, parent row, state)
+        for (row, (values, g)) in enumerate(zip(chunk['state'].tolist(), chunk['g'].tolist())):
+            self.num_expanded += 1
+            for arc in self.problem.neighbors(enc.state(tuple(values))):
+                self.num_generated += 1
+                child = arc.to_node
+                if child.values in children:
+                    self.num_duplicates += 1
+                    if children[child.values][0] <= g + arc.cost:
+                        continue
+                children[child.values] = (g + arc.cost, self.action_index[arc.action], row, child)
+            if len(children) >= self.chunk_size:
+                self.write_children(children, file_number)
+                children = {}
+        self.write_children(children, file_number)
+
+    def write_children(self, children, file_number):
+        """adds children to the layers, except for the explored states;
+        the heuristic is only evaluated for the others"""
+        rows = np.array([(values, g, action, file_number, row)
+                         for (values, (g, action, row, state)) in children.items()],
+                        dtype=self.row_type)
+        states = [state for (g, action, row, state) in children.values()]
+        keys = self.keys(rows)
+        order = np.argsort(keys)
+        new = np.zeros(len(rows), dtype=bool)
+        new[order] = ~self.explored(keys[order])
+        self.num_duplicates += len(rows) - int(new.sum())
+        by_f = {}
+        for i in np.flatnonzero(new).tolist():
+            f = rows['g'][i] + self.problem.heuristic(states[i])
+            if f < float("inf"):
+                by_f.setdefault(f.item(), []).append(i)
+        self.append_rows({f:[rows[indexes]] for (f, indexes) in by_f.items()})
+
+    def path_to(self, file_number, row):
+        """returns the Path to the state in the row of closed file file_number,
+        found by following the parents and redoing their actions"""
+        actions = []
+        while file_number >= 0:
+            entry = np.memmap(self.file(self.closed[file_number]), dtype=self.row_type, mode='r')[row]
+            if entry['action'] >= 0:
+                actions.append(int(entry['action']))
+            (file_number, row) = (int(entry['parent_file']), int(entry['parent_row']))
+        enc = self.encoding
+        path = Path(self.problem.start_node())
+        for i in reversed(actions):
+            state = path.end()
+            path = Path(path, Arc(state, enc.successor(state, i), enc.actions[i].cost, enc.actions[i]))
+        return path
+
+    def stats(self):
+        """returns the Search_stats; memory is the size of the largest
+        chunk in memory, and peak_explored counts the states on disk"""
+        stats = Search_stats(self, self.num_generated, self.num_expanded, self.num_duplicates,
+                             self.peak_chunk, sum(size for (name, size) in self.index))
+        stats.memory = 2*self.peak_chunk*self.row_type.itemsize
+        return stats
+
+# from library.stripsForwardPlanner import Forward_STRIPS
+# from starcraft.starcraftProblem import problem_train_tank
+# s = External_AStar(Forward_STRIPS(problem_train_tank, compact=True), chunk_size=10**4)
+# s.search(max_expansions=1000)    # interrupted
+# s = External_AStar(Forward_STRIPS(problem_train_tank, compact=True), chunk_size=10**4, resume=True)
+# s.search()
@@ -8,19 +8,33 @@
 # Attribution-NonCommercial-ShareAlike 4.0 International License.
 # See: https://creativecommons.org/licenses/by-nc-sa/4.0/deed.en
 
-from library.display import Displayable
+from library.display import Displayable, Lazy
+from library.searchStats import Search_stats
 
 class Searcher(Displayable):
     """returns a searcher for a problem.
     Paths can be found by repeatedly calling search().
     This does depth-first search unless overridden
     """
-    def __init__(self, problem):
-        """creates a searcher from a problem
+    def __init__(self, problem, cycle_pruning=False, max_transpositions=0):
+        """creates a searcher from a problem.
+        cycle_pruning is True to prune paths that return to a node on the path.
+        max_transpositions is the size of the transposition table, mapping
+           nodes to the lowest cost found to them: a path to a node in the
+           table is pruned unless it is cheaper. 0 means no table; when it is
+           full, no more nodes are added.
         """
         self.problem = problem
+        self.cycle_pruning = cycle_pruning
+        self.current = []       # the paths along the last path expanded
+        self.on_path = set()    # the ends of the paths in current
+        self.max_transpositions = max_transpositions
+        self.best_cost = {}     # the transposition table: node -> lowest cost
         self.initialize_frontier()
         self.num_expanded = 0
+        self.num_generated = 0
+        self.num_pruned = 0
+        self.max_frontier = 0   # the largest size of the frontier
         self.add_to_frontier(Path(problem.start_node()))
         super().__init__()
 
@@ -31,7 +45,37 @@ class Searcher(Displayable):
         return self.frontier == []
         
     def add_to_frontier(self,path):
+        self.num_generated += 1
+        if self.handlers:
+            self.emit('generate', path=path)
         self.frontier.append(path)
+
+    def pop_from_frontier(self):
+        return self.frontier.pop()
+
+    def pruned(self, path):
+        """is True if path is pruned by cycle pruning or the transposition table.
+        The paths are popped depth-first, so the path path extends is on
+        current; the paths after it are removed (amortized O(1))."""
+        if self.cycle_pruning:
+            while self.current and self.current[-1] is not path.initial:
+                self.on_path.discard(self.current.pop().end())
+            if path.end() in self.on_path:
+                return True
+        if self.max_transpositions:
+            node = path.end()
+            cost = self.best_cost.get(node)
+            if cost is not None and cost <= path.cost:
+                return True
+            if cost is not None or len(self.best_cost) < self.max_transpositions:
+                self.best_cost[node] = path.cost
+        return False
+
+    def expanding(self, path):
+        """records that path is being expanded (for cycle pruning)"""
+        if self.cycle_pruning:
+            self.current.append(path)
+            self.on_path.add(path.end())
         
     def search(self):
         """returns (next) path from the problem's start node
@@ -39,25 +83,43 @@ class Searcher(Displayable):
         Returns None if no path exists.
         """
         while not self.empty_frontier():
-            self.path = self.frontier.pop()
+            self.path = self.pop_from_frontier()
+            if (self.cycle_pruning or self.max_transpositions) and self.pruned(self.path):
+                self.num_pruned += 1
+                if self.handlers:
+                    self.emit('prune', path=self.path)
+                continue
             self.num_expanded += 1
             if self.problem.is_goal(self.path.end()):    # solution found
                 self.solution = self.path   # store the solution found
+                self.emit('solution', path=self.path)
                 self.display(1, f"Solution: {self.path} (cost: {self.path.cost})\n",
                     self.num_expanded, "paths have been expanded and",
                             len(self.frontier), "paths remain in the frontier")
                 return self.path
             else:
-                self.display(4,f"Expanding: {self.path} (cost: {self.path.cost})")
+                if self.handlers:
+                    self.emit('expand', path=self.path)
+                self.expanding(self.path)
+                self.display(4, Lazy(lambda: f"Expanding: {self.path} (cost: {self.path.cost})"))
                 neighs = self.problem.neighbors(self.path.end())
-                self.display(2,f"Expanding: {self.path} with neighbors {neighs}")
+                self.display(2, Lazy(lambda: f"Expanding: {self.path} with neighbors {neighs}"))
                 for arc in reversed(list(neighs)):
                     self.add_to_frontier(Path(self.path,arc))
-                self.display(3, f"New frontier: {[p.end() for p in self.frontier]}")
+                if len(self.frontier) > self.max_frontier:
+                    self.max_frontier = len(self.frontier)
+                self.display(3, Lazy(lambda: f"New frontier: {[p.end() for p in self.frontier]}"))
 
         self.display(0,"No (more) solutions. Total of",
                      self.num_expanded,"paths expanded.")
 
+    def stats(self):
+        """returns the Search_stats of the search so far"""
+        return Search_stats(self, self.num_generated, self.num_expanded,
+                            duplicates=self.num_pruned,
+                            peak_frontier=self.max_frontier,
+                            peak_explored=len(self.best_cost))
+
 # Depth-first search for problem1:
 # searcher1 = Searcher(searchExample.problem1)
 # searcher1.search()  # find first solution
@@ -84,6 +146,8 @@ class FrontierPQ(object):
         """
         self.frontier_index = 0  # the number of items added to the frontier
         self.frontierpq = []  # the frontier priority queue
+        self.num_pops = 0  # the number of items removed from the frontier
+        self.max_size = 0  # the largest size the frontier has had
 
     def empty(self):
         """is True if the priority queue is empty"""
@@ -94,12 +158,30 @@ class FrontierPQ(object):
         value is the value to be minimized"""
         self.frontier_index += 1    # get a new unique index
         heapq.heappush(self.frontierpq,(value, -self.frontier_index, path))
+        if len(self.frontierpq) > self.max_size:
+            self.max_size = len(self.frontierpq)
 
     def pop(self):
         """returns and removes the path of the frontier with minimum value.
         """
-        (_,_,path) = heapq.heappop(self.frontierpq)
-        return path 
+        (_,path) = self.pop_item()
+        return path
+
+    def pop_item(self):
+        """returns and removes (value, path) for the path of the frontier
+        with minimum value.
+        """
+        (value,_,path) = heapq.heappop(self.frontierpq)
+        self.num_pops += 1
+        return (value, path)
+
+    def top_value(self):
+        """returns the minimum value of the (non-empty) frontier"""
+        return self.frontierpq[0][0]
+
+    def num_heap_ops(self):
+        """returns the number of pushes and pops done on the frontier"""
+        return self.frontier_index + self.num_pops
 
     def count(self,val):
         """returns the number of elements of the frontier with value=val"""
@@ -118,24 +200,200 @@ class FrontierPQ(object):
         for (_,_,path) in self.frontierpq:
             yield path
     
+class FrontierBuckets(object):
+    """A frontier with a bucket for each value (e.g., path cost + h),
+    for when there are few distinct values, as with integer costs.
+    Within a bucket, paths are in buckets by heuristic value (value minus
+    cost), and the lowest heuristic value is returned first (then the
+    last added, as for FrontierPQ). The distinct values (and heuristic
+    values within a bucket) are kept in small heaps, so adding to or popping
+    from an existing bucket is O(1), and count(val) is O(1).
+    The interface is that of FrontierPQ.
+    """
+    def __init__(self):
+        self.buckets = {}     # value -> {h -> list of paths}
+        self.counts = {}      # value -> number of paths with that value
+        self.values = []      # heap of the values with a bucket
+        self.h_values = {}    # value -> heap of the h values of its bucket
+        self.size = 0
+        self.frontier_index = 0   # number of paths added
+        self.num_pops = 0
+        self.max_size = 0
+
+    def empty(self):
+        """is True if the frontier is empty"""
+        return self.size == 0
+
+    def add(self, path, value):
+        """add a path to the frontier with the value to be minimized"""
+        self.frontier_index += 1
+        h = value - path.cost
+        bucket = self.buckets.get(value)
+        if bucket is None:
+            bucket = self.buckets[value] = {}
+            self.counts[value] = 0
+            self.h_values[value] = []
+            heapq.heappush(self.values, value)
+        stack = bucket.get(h)
+        if stack is None:
+            stack = bucket[h] = []
+            heapq.heappush(self.h_values[value], h)
+        stack.append(path)
+        self.counts[value] += 1
+        self.size += 1
+        if self.size > self.max_size:
+            self.max_size = self.size
+
+    def pop(self):
+        """returns and removes a path of the frontier with minimum value."""
+        (_,path) = self.pop_item()
+        return path
+
+    def pop_item(self):
+        """returns and removes (value, path) for a path of the frontier
+        with minimum value."""
+        value = self.values[0]
+        bucket = self.buckets[value]
+        h_values = self.h_values[value]
+        stack = bucket[h_values[0]]
+        path = stack.pop()
+        if not stack:
+            del bucket[heapq.heappop(h_values)]
+            if not bucket:
+                heapq.heappop(self.values)
+                del self.buckets[value], self.counts[value], self.h_values[value]
+        if value in self.counts:
+            self.counts[value] -= 1
+        self.size -= 1
+        self.num_pops += 1
+        return (value, path)
+
+    def top_value(self):
+        """returns the minimum value of the (non-empty) frontier"""
+        return self.values[0]
+
+    def num_heap_ops(self):
+        """returns the number of pushes and pops done on the frontier"""
+        return self.frontier_index + self.num_pops
+
+    def count(self,val):
+        """returns the number of elements of the frontier with value=val"""
+        return self.counts.get(val, 0)
+
+    def __repr__(self):
+        """string representation of the frontier"""
+        return str([(value,str(path)) for value in sorted(self.buckets)
+                    for stack in self.buckets[value].values() for path in stack])
+
+    def __len__(self):
+        """length of the frontier"""
+        return self.size
+
+    def __iter__(self):
+        """iterate through the paths in the frontier"""
+        for bucket in self.buckets.values():
+            for stack in bucket.values():
+                yield from stack
+
 class AStarSearcher(Searcher):
     """returns a searcher for a problem.
     Paths can be found by repeatedly calling search().
     """
 
-    def __init__(self, problem):
+    def __init__(self, problem, lazy=False):
+        """lazy is True for deferred evaluation: a path is added to the
+        frontier with a lower bound on its value from the heuristic value
+        of the path it extends, and the heuristic of its end is only
+        computed when it is popped. If its value is then higher than the
+        best value left on the frontier, it is put back with its new value.
+        The lower bound is h(parent)-cost(arc), which does not overestimate
+        when the heuristic is consistent; a path is only returned at its
+        real value.
+        """
+        self.lazy = lazy
+        self.evaluated = {}     # id of a path put back on the frontier -> its heuristic value
+        self.path_h = 0         # heuristic value of the end of the path being expanded
+        self.num_added = 0      # paths added to the frontier
+        self.num_heuristic_calls = 0
         super().__init__(problem)
 
     def initialize_frontier(self):
-        self.frontier = FrontierPQ()
+        """uses buckets when the costs are integers, as then many paths
+        have the same value"""
+        if self.problem.integer_costs():
+            self.frontier = FrontierBuckets()
+        else:
+            self.frontier = FrontierPQ()
 
     def empty_frontier(self):
         return self.frontier.empty()
 
     def add_to_frontier(self,path):
         """add path to the frontier with the appropriate cost"""
-        value = path.cost+self.problem.heuristic(path.end())
-        self.frontier.add(path, value)
+        self.num_added += 1
+        if self.handlers:
+            self.emit('generate', path=path)
+        self.frontier.add(path, self.path_value(path))
+
+    def path_value(self,path):
+        """the value of path to be minimized: its cost plus the heuristic
+        value of its end node. If lazy, the heuristic value of the node it
+        extends less the cost of the arc (at least 0) is used instead.
+        This can be overridden in subclasses."""
+        if self.lazy:
+            arc_cost = path.arc.cost if path.arc is not None else 0
+            return path.cost+max(0, self.path_h-arc_cost)
+        return path.cost+self.evaluate(path.end())
+
+    def evaluate(self,node):
+        """returns the heuristic value of node, counting the calls"""
+        self.num_heuristic_calls += 1
+        return self.problem.heuristic(node)
+
+    def pop_from_frontier(self):
+        """returns and removes the next path to expand from the frontier.
+        If lazy, the heuristic of the path is computed here, and the path
+        is put back if it is no longer the best."""
+        if not self.lazy:
+            return self.frontier.pop()
+        while True:
+            (value, path) = self.frontier.pop_item()
+            if id(path) in self.evaluated:
+                self.path_h = self.evaluated.pop(id(path))
+                return path
+            if not self.to_expand(path):
+                return path
+            self.path_h = self.evaluate(path.end())
+            new_value = path.cost+self.path_h
+            if (new_value > value and not self.frontier.empty()
+                   and new_value > self.frontier.top_value()):
+                self.evaluated[id(path)] = self.path_h
+                self.frontier.add(path, new_value)
+            else:
+                return path
+
+    def to_expand(self,path):
+        """is False if path will be discarded when popped, so its
+        heuristic value is not needed. This can be overridden in subclasses."""
+        return True
+
+    def stats(self):
+        """returns the Search_stats of the search so far"""
+        return Search_stats(self, self.num_added, self.num_expanded,
+                            peak_frontier=self.frontier.max_size,
+                            heuristic_calls=self.num_heuristic_calls)
+
+    def num_heuristic_saved(self):
+        """the number of heuristic evaluations saved by deferred evaluation"""
+        return self.num_added - self.num_heuristic_calls
+
+    def search(self):
+        """returns (next) path found by A* (see Searcher.search)"""
+        path = super().search()
+        if self.lazy:
+            self.display(1, "Heuristic evaluations:", self.num_heuristic_calls,
+                         "saved:", self.num_heuristic_saved())
+        return path
 
 # import library.searchExample
 #
@@ -166,8 +424,13 @@ if __name__ == "__main__":
 # searcher2.search()  # find next path
 # searcher3 = Searcher(searchExample.cyclic_simp_delivery_graph)   # DFS
 # searcher3.search()  # find first path with DFS. What do you expect to happen?
+# Searcher(searchExample.cyclic_simp_delivery_graph, cycle_pruning=True).search()
+# Searcher(searchExample.cyclic_simp_delivery_graph, max_transpositions=1000).search()
 # searcher4 = AStarSearcher(searchExample.cyclic_simp_delivery_graph)    # A*
 # searcher4.search()  # find first path
+# searcher5 = AStarSearcher(searchExample.simp_delivery_graph)
+# searcher5.add_handler('expand', lambda searcher, path: print("expanding", path.end()))
+# searcher5.search()  # find first path, reporting each expansion
 
 # To use the GUI for A* search do the following
 # python -i searchGUI.py
@@ -0,0 +1,249 @@
+# searchHDAstar.py - Hash-distributed parallel A* search
+
+import heapq
+import multiprocessing
+import queue
+import time
+from library.searchGeneric import Searcher
+from library.searchProblem import Arc, path_from_arcs
+
+class Worker_failed(Exception):
+    """raised when an HDA* worker raises an exception or dies"""
+
+class HDAStarSearcher(Searcher):
+    """returns a hash-distributed A* (HDA*) searcher for a problem.
+    The nodes are divided amongst num_workers processes by their hash:
+    each worker keeps the frontier and the lowest cost found for the
+    nodes it owns, and sends the neighbors it generates, in batches, to
+    the workers that own them. When a worker expands a goal node, the cost
+    becomes a bound for all workers. The search stops when all workers
+    are idle and every batch sent has been received (checked by two
+    consecutive waves of status requests with the same counts), so the
+    path returned is optimal if the heuristic is admissible.
+    context is the multiprocessing start method ("fork", "spawn" or
+    "forkserver"); None for the default of the platform. Unless the
+    workers are forked, the problem must be picklable. Its nodes must be
+    picklable, and their hash must be the same in every worker (so with
+    "spawn", use Compact_states rather than States, whose hash depends on
+    the hash seed of the process).
+    If a worker raises an exception or dies, search() raises Worker_failed.
+    """
+    poll_interval = 0.5   # seconds between checks that the workers are alive
+
+    def __init__(self, problem, num_workers=None, batch_size=32, context=None):
+        self.num_workers = num_workers or multiprocessing.cpu_count()
+        self.context = context
+        self.batch_size = batch_size    # expansions between sending batches
+        self.done = False
+        super().__init__(problem)
+
+    def search(self):
+        """returns an optimal path from the problem's start node to a goal
+        node, or None if there is none. A second call returns None."""
+        if self.done:
+            self.display(0,"No (more) solutions. Total of",
+                         self.num_expanded,"paths expanded.")
+            return None
+        self.done = True
+        ctx = multiprocessing.get_context(self.context)
+        n = self.num_workers
+        inboxes = [ctx.Queue() for i in range(n)]
+        results = ctx.Queue()
+        workers = [ctx.Process(target=hda_worker, daemon=True,
+                               args=(i, n, self.problem, inboxes, results, self.batch_size))
+                   for i in range(n)]
+        start_time = time.perf_counter()
+        self.workers = workers
+        for w in workers:
+            w.start()
+        try:
+            start = self.problem.start_node()
+            inboxes[hash(start) % n].put(('nodes', [(start, 0, None, None, 0)]))
+            goal = self.wait_for_termination(inboxes, results)
+            self.path = self.trace(goal, inboxes, results) if goal is not None else None
+            for inbox in inboxes:
+                inbox.put(('stop',))
+            self.expanded_by_worker = [0]*n
+            for i in range(n):
+                (_, worker, expanded) = self.get(results, 'stats', stopping=True)
+                self.expanded_by_worker[worker] = expanded
+            self.num_expanded = sum(self.expanded_by_worker)
+        finally:
+            for w in workers:
+                w.join(timeout=1)
+                if w.is_alive():
+                    w.terminate()
+        self.search_time = time.perf_counter() - start_time
+        self.solution = self.path
+        if self.path is None:
+            self.display(0,"No solution. Total of", self.num_expanded,"paths expanded.")
+        else:
+            self.display(1, f"Solution: {self.path} (cost: {self.path.cost})\n",
+                         self.num_expanded, "paths have been expanded by", n, "workers,",
+                         f"{self.num_expanded/max(self.search_time,1e-9):.0f} per second")
+        return self.path
+
+    def wait_for_termination(self, inboxes, results):
+        """handles the messages from the workers until the search has
+        finished; returns the best goal node found, or None"""
+        bound = float("inf")
+        goal = None
+        wave = 0
+        replies = {}
+        previous = None       # the counts of the previous wave, if all were idle
+        for inbox in inboxes:
+            inbox.put(('probe', wave))
+        while True:
+            msg = self.receive(results)
+            if msg[0] == 'solution':
+                (_, node, cost) = msg
+                if cost < bound:
+                    bound, goal = cost, node
+                    for inbox in inboxes:
+                        inbox.put(('bound', bound))
+            elif msg[0] == 'status' and msg[1] == wave:
+                (_, _, worker, idle, sent, received) = msg
+                replies[worker] = (idle, sent, received)
+                if len(replies) == len(inboxes):
+                    counts = (1+sum(s for (_,s,_) in replies.values()),   # 1 for the start
+                              sum(r for (_,_,r) in replies.values()))
+                    if all(idle for (idle,_,_) in replies.values()) and counts[0] == counts[1]:
+                        if counts == previous:
+                            return goal
+                        previous = counts
+                    else:
+                        previous = None
+                        time.sleep(0.001)
+                    wave += 1
+                    replies = {}
+                    for inbox in inboxes:
+                        inbox.put(('probe', wave))
+
+    def trace(self, goal, inboxes, results):
+        """returns the path to goal, asking the owner of each node for
+        the node and arc it was reached from"""
+        steps = []
+        node = goal
+        while True:
+            inboxes[hash(node) % len(inboxes)].put(('trace', node))
+            (_, parent, action, cost) = self.get(results, 'parent')
+            if parent is None:
+                break
+            steps.append(Arc(parent, node, cost, action))
+            node = parent
+        return path_from_arcs(node, reversed(steps))
+
+    def get(self, results, kind, stopping=False):
+        """returns the next message of kind from results, skipping others"""
+        while True:
+            msg = self.receive(results, stopping)
+            if msg[0] == kind:
+                return msg
+
+    def receive(self, results, stopping=False):
+        """returns the next message from the workers. Raises Worker_failed
+        if a worker reports an error, or has exited without one (when
+        stopping, workers exit normally after sending their stats)."""
+        while True:
+            try:
+                msg = results.get(timeout=self.poll_interval)
+            except queue.Empty:
+                for (i, w) in enumerate(self.workers):
+                    if w.exitcode is not None and (w.exitcode != 0 or not stopping):
+                        try:   # its last messages may still be in the queue
+                            msg = results.get(timeout=self.poll_interval)
+                            break
+                        except queue.Empty:
+                            raise Worker_failed(f"worker {i} exited with code {w.exitcode}")
+                else:
+                    continue
+            if msg[0] == 'error':
+                raise Worker_failed(f"worker {msg[1]}: {msg[2]}")
+            return msg
+
+def hda_worker(me, n, problem, inboxes, results, batch_size):
+    """runs the HDA* worker with number me of n, reporting an exception
+    raised on the results queue"""
+    try:
+        run_worker(me, n, problem, inboxes, results, batch_size)
+    except Exception as error:
+        results.put(('error', me, repr(error)))
+
+def run_worker(me, n, problem, inboxes, results, batch_size):
+    """the HDA* worker with number me of n.
+    best maps each node owned to (g, parent, action, cost) for the cheapest
+    path found to it; frontier is a heap of (f, -g, index, node, g)."""
+    best = {}
+    frontier = []
+    index = 0
+    bound = float("inf")
+    sent = received = expanded = 0
+    outboxes = [[] for i in range(n)]
+
+    def add(node, g, parent, action, cost):
+        nonlocal index
+        if g < best.get(node, (float("inf"),))[0]:
+            best[node] = (g, parent, action, cost)
+            f = g + problem.heuristic(node)
+            if f < bound:
+                index += 1
+                heapq.heappush(frontier, (f, -g, index, node, g))
+
+    while True:
+        # handle the messages that have arrived; wait for one if idle
+        try:
+            msg = inboxes[me].get(timeout=0.01) if not frontier else inboxes[me].get_nowait()
+        except queue.Empty:
+            msg = None
+        while msg is not None:
+            if msg[0] == 'nodes':
+                received += 1
+                for item in msg[1]:
+                    add(*item)
+            elif msg[0] == 'bound':
+                bound = min(bound, msg[1])
+            elif msg[0] == 'probe':
+                results.put(('status', msg[1], me, not frontier, sent, received))
+            elif msg[0] == 'trace':
+                (_, parent, action, cost) = best[msg[1]]
+                results.put(('parent', parent, action, cost))
+            elif msg[0] == 'stop':
+                results.put(('stats', me, expanded))
+                return
+            try:
+                msg = inboxes[me].get_nowait()
+            except queue.Empty:
+                msg = None
+        # expand up to batch_size nodes
+        for i in range(batch_size):
+            if not frontier:
+                break
+            (f, _, _, node, g) = heapq.heappop(frontier)
+            if f >= bound:
+                frontier.clear()    # no node left can lead to a better solution
+                break
+            if g > best[node][0]:
+                continue            # a cheaper path to node has been found
+            if problem.is_goal(node):
+                bound = g
+                results.put(('solution', node, g))
+                continue
+            expanded += 1
+            for arc in problem.neighbors(node):
+                owner = hash(arc.to_node) % n
+                item = (arc.to_node, g+arc.cost, node, arc.action, arc.cost)
+                if owner == me:
+                    add(*item)
+                else:
+                    outboxes[owner].append(item)
+        for (owner, items) in enumerate(outboxes):
+            if items:
+                inboxes[owner].put(('nodes', items))
+                sent += 1
+                outboxes[owner] = []
+
+# import library.searchExample
+# HDAStarSearcher(searchExample.cyclic_simp_delivery_graph, num_workers=2).search()
+# from library.stripsForwardPlanner import Forward_STRIPS
+# from starcraft.starcraftProblem import problem_train_tank
+# HDAStarSearcher(Forward_STRIPS(problem_train_tank, compact=True), num_workers=8).search()
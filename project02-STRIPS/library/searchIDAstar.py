@@ -0,0 +1,100 @@
+# searchIDAstar.py - Iterative-deepening A* search
+
+from library.display import Lazy
+from library.searchGeneric import Searcher
+from library.searchProblem import Path
+
+class IDAStarSearcher(Searcher):
+    """returns an iterative-deepening A* searcher for a problem.
+    Paths can be found by repeatedly calling search().
+    Each iteration is a depth-first search that prunes paths whose cost
+    plus heuristic exceeds a bound; the next bound is the least value
+    that was pruned. Only the current path and the neighbors still to be
+    tried along it are stored, so memory is linear in the depth.
+    Nodes that are already on the current path are pruned (cycle pruning).
+    """
+    def __init__(self, problem):
+        super().__init__(problem)
+        self.frontier = []    # not used; the paths are generated by solutions
+        self.num_iterations = 0
+        self.max_depth = 0    # the longest path considered
+        self.max_stored = 0   # the most paths held in memory at once
+        self.solutions = self.iterate()
+
+    def search(self):
+        """returns (next) path from the problem's start node
+        to a goal node, in order of cost.
+        Returns None if no path exists.
+        """
+        path = next(self.solutions, None)
+        if path is not None:
+            self.solution = path
+            self.display(1, f"Solution: {path} (cost: {path.cost})\n",
+                         self.num_expanded, "paths have been expanded in",
+                         self.num_iterations, "iterations; at most",
+                         self.max_stored, "paths were stored")
+        else:
+            self.display(0,"No (more) solutions. Total of",
+                         self.num_expanded,"paths expanded.")
+        return path
+
+    def iterate(self):
+        """generates the solutions, in order of increasing bound"""
+        start = Path(self.problem.start_node())
+        bound = self.problem.heuristic(start.end())
+        previous = -1   # solutions costing no more than this have been returned
+        while bound < float("inf"):
+            self.num_iterations += 1
+            self.display(2, "Iteration", self.num_iterations, "with bound", bound)
+            next_bound = float("inf")
+            stack = [iter([start])]   # the paths still to try at each depth
+            extended = []             # the path being extended at each depth
+            on_path = set()           # the nodes of the current path
+            stored = 0                # the number of paths on stack
+            sizes = [0]
+            while stack:
+                path = next(stack[-1], None)
+                if path is None:
+                    stack.pop()
+                    stored -= sizes.pop()
+                    if extended:
+                        on_path.discard(extended.pop().end())
+                    continue
+                node = path.end()
+                value = path.cost + self.problem.heuristic(node)
+                if value > bound:
+                    next_bound = min(next_bound, value)
+                    if self.handlers:
+                        self.emit('prune', path=path)
+                    continue
+                if node in on_path:
+                    if self.handlers:
+                        self.emit('prune', path=path)
+                    continue
+                self.num_expanded += 1
+                if self.problem.is_goal(node):
+                    if path.cost > previous:
+                        self.emit('solution', path=path)
+                        yield path
+                    continue
+                if self.handlers:
+                    self.emit('expand', path=path)
+                self.display(4, Lazy(lambda: f"Expanding: {path} (cost: {path.cost})"))
+                neighs = list(self.problem.neighbors(node))
+                extended.append(path)
+                on_path.add(node)
+                new_paths = [Path(path,arc) for arc in neighs]
+                if self.handlers:
+                    for new_path in new_paths:
+                        self.emit('generate', path=new_path)
+                stack.append(iter(new_paths))
+                sizes.append(len(neighs))
+                stored += len(neighs)
+                self.max_depth = max(self.max_depth, len(extended))
+                self.max_stored = max(self.max_stored, stored)
+            previous = bound
+            bound = next_bound
+
+# import library.searchExample
+# IDAStarSearcher(searchExample.simp_delivery_graph).search()
+# IDAStarSearcher(searchExample.cyclic_simp_delivery_graph).search()
@@ -0,0 +1,176 @@
+# searchLPAstar.py - Lifelong planning A* (LPA*): replanning when arc costs change
+
+import heapq
+from library.display import Displayable
+from library.searchProblem import Path
+
+class LPAStarSearcher(Displayable):
+    """returns a lifelong planning A* (LPA*) searcher for a
+    Search_problem_from_explicit_graph. search() returns a cheapest path
+    for the current arc costs. When the costs of some arcs change (by
+    setting arc.cost of arcs of the graph; inf removes an arc), calling
+    update_arcs(arcs) then search() repairs the previous search: only the
+    nodes whose cost from the start changed are expanded again.
+    The heuristic must be consistent (e.g., 0). g[n] is the cost of the
+    cheapest path found to n, and rhs[n] is the least cost through its
+    predecessors; the nodes for which they differ are on the frontier.
+    The keys of the goals are kept up to date in a second priority queue
+    as their g and rhs change, so the best goal is found without looking
+    at every goal.
+    """
+    def __init__(self, problem):
+        self.problem = problem
+        self.start = problem.start_node()
+        self.g = {}
+        self.rhs = {self.start: 0}
+        self.h = {}
+        self.frontier = []   # (key, tie-breaker, node); an entry is stale if
+        self.queued = {}     # node -> key on the frontier differs from key
+        self.num_added = 0
+        self.into = None     # node -> list of arcs into node
+        self.goals = set(problem.goals)
+        self.goal_frontier = []   # (key, tie-breaker, goal); stale unless
+        self.goal_keys = {}       # goal -> key on the goal frontier is its key
+        self.num_expanded = 0
+        self.solution = None
+        self.queue(self.start)
+
+    def arcs_into(self, node):
+        if self.into is None:
+            self.into = {n:[] for n in self.problem.neighs}
+            for arc in self.problem.arcs:
+                self.into[arc.to_node].append(arc)
+        return self.into[node]
+
+    def heuristic_value(self, node):
+        if node not in self.h:
+            self.h[node] = self.problem.heuristic(node)
+        return self.h[node]
+
+    def key(self, node):
+        best = min(self.g.get(node, float("inf")), self.rhs.get(node, float("inf")))
+        return (best + self.heuristic_value(node), best)
+
+    def queue(self, node):
+        """puts node on the frontier if it is inconsistent, else removes it.
+        This is called whenever the key of node may have changed."""
+        if node in self.goals:
+            self.update_goal(node)
+        if self.g.get(node, float("inf")) != self.rhs.get(node, float("inf")):
+            key = self.key(node)
+            if self.queued.get(node) != key:
+                self.queued[node] = key
+                heapq.heappush(self.frontier, (key, self.num_added, node))
+                self.num_added += 1
+        else:
+            self.queued.pop(node, None)
+
+    def update_goal(self, goal):
+        """puts goal on the goal frontier with its current key"""
+        key = self.key(goal)
+        if self.goal_keys.get(goal) != key:
+            self.goal_keys[goal] = key
+            heapq.heappush(self.goal_frontier, (key, self.num_added, goal))
+            self.num_added += 1
+
+    def best_goal(self):
+        """returns (key, goal) for the goal with the least key"""
+        while self.goal_frontier:
+            (key, _, goal) = self.goal_frontier[0]
+            if self.goal_keys[goal] == key:
+                return (key, goal)
+            heapq.heappop(self.goal_frontier)   # stale entry
+        return ((float("inf"), float("inf")), None)
+
+    def update_node(self, node):
+        """recomputes rhs[node] from its predecessors"""
+        if node != self.start:
+            self.rhs[node] = min((self.g.get(arc.from_node, float("inf")) + arc.cost
+                                  for arc in self.arcs_into(node)), default=float("inf"))
+        self.queue(node)
+
+    def top_key(self):
+        while self.frontier:
+            (key, _, node) = self.frontier[0]
+            if self.queued.get(node) == key:
+                return key
+            heapq.heappop(self.frontier)   # stale entry
+        return (float("inf"), float("inf"))
+
+    def update_arcs(self, arcs):
+        """arcs is a collection of arcs of the graph whose costs have changed"""
+        for arc in arcs:
+            self.update_node(arc.to_node)
+
+    def compute_shortest_path(self):
+        """expands inconsistent nodes until the best goal is consistent and
+        no node on the frontier can lead to a cheaper goal. Returns that goal."""
+        expanded = 0
+        while True:
+            (goal_key, goal) = self.best_goal()
+            top_key = self.top_key()
+            if top_key == (float("inf"), float("inf")) or (
+                    top_key >= goal_key and self.g.get(goal) == self.rhs.get(goal)):
+                return (goal, expanded)
+            (_, _, node) = heapq.heappop(self.frontier)
+            del self.queued[node]
+            expanded += 1
+            old_g = self.g.get(node, float("inf"))
+            if old_g > self.rhs[node]:    # the cost of node was lowered
+                g = self.g[node] = self.rhs[node]
+                for arc in self.problem.neighbors(node):
+                    to_node = arc.to_node
+                    if to_node != self.start and g + arc.cost < self.rhs.get(to_node, float("inf")):
+                        self.rhs[to_node] = g + arc.cost
+                        self.queue(to_node)
+            else:                         # the cost of node was raised
+                self.g[node] = float("inf")
+                self.update_node(node)
+                for arc in self.problem.neighbors(node):
+                    if self.rhs.get(arc.to_node) == old_g + arc.cost:
+                        self.update_node(arc.to_node)   # node may have been its best predecessor
+
+    def search(self):
+        """returns a cheapest path to a goal for the current costs, or None"""
+        (goal, expanded) = self.compute_shortest_path()
+        self.num_expanded += expanded
+        if goal is None or self.g.get(goal, float("inf")) == float("inf"):
+            self.solution = None
+            self.display(1, "No solution.", expanded, "nodes expanded.")
+            return None
+        self.solution = self.path_to(goal)
+        if self.solution is None:
+            self.display(1, "No path to", goal, "from the predecessors;",
+                         expanded, "nodes expanded.")
+            return None
+        self.display(1, f"Solution: {self.solution} (cost: {self.solution.cost})\n",
+                     expanded, "nodes expanded;", self.num_expanded, "in total")
+        return self.solution
+
+    def path_to(self, node):
+        """returns the Path to node following the cheapest predecessors,
+        or None if they lead back to a node already on the path"""
+        arcs = []
+        visited = {node}
+        while node != self.start:
+            arc = min((arc for arc in self.arcs_into(node) if arc.from_node not in visited),
+                      key=lambda arc: self.g.get(arc.from_node, float("inf")) + arc.cost,
+                      default=None)
+            if arc is None:
+                return None
+            arcs.append(arc)
+            node = arc.from_node
+            visited.add(node)
+        path = Path(self.start)
+        for arc in reversed(arcs):
+            path = Path(path, arc)
+        return path
+
+# from library.searchBenchmark import grid_graph
+# graph = grid_graph(10**4)
+# s = LPAStarSearcher(graph)
+# s.search()
+# changed = graph.arcs[:10]
+# for arc in changed: arc.cost = 5
+# s.update_arcs(changed)
+# s.search()    # only the nodes affected by the changes are expanded
@@ -10,14 +10,37 @@
 
 from library.searchGeneric import AStarSearcher
 from library.searchProblem import Path
+from library.display import Lazy
+from library.searchStats import approximate_memory
 
 class SearcherMPP(AStarSearcher):
     """returns a searcher for a problem.
     Paths can be found by repeatedly calling search().
     """
-    def __init__(self, problem):
-        super().__init__(problem)
+    def __init__(self, problem, lazy=False):
         self.explored = set()
+        self.best_g = {}   # node -> lowest cost of a path to node put on the frontier
+        self.num_pruned = 0   # paths not added as no cheaper than a previous path
+        super().__init__(problem, lazy)
+
+    def add_to_frontier(self, path):
+        """add path to the frontier unless it reaches an explored node or
+        a path that is no more costly to the same node has already been added.
+        A cheaper path is added without removing the old one (lazy
+        decrease-key); the old one is discarded when popped as its
+        node has been explored by then."""
+        node = path.end()
+        if node in self.explored or self.best_g.get(node, float("inf")) <= path.cost:
+            self.num_pruned += 1
+            if self.handlers:
+                self.emit('prune', path=path)
+        else:
+            self.best_g[node] = path.cost
+            super().add_to_frontier(path)
+
+    def to_expand(self, path):
+        """is False if the end of path has already been explored"""
+        return path.end() not in self.explored
 
     def search(self):
         """returns next path from an element of problem's start nodes
@@ -25,26 +48,52 @@ class SearcherMPP(AStarSearcher):
         Returns None if no path exists.
         """
         while not self.empty_frontier():
-            self.path = self.frontier.pop()
+            self.path = self.pop_from_frontier()
             if self.path.end() not in self.explored:
                 self.explored.add(self.path.end())
                 self.num_expanded += 1
                 if self.problem.is_goal(self.path.end()):
                     self.solution = self.path   # store the solution found
+                    self.emit('solution', path=self.path)
                     self.display(1, f"Solution: {self.path} (cost: {self.path.cost})\n",
                     self.num_expanded, "paths have been expanded and",
                             len(self.frontier), "paths remain in the frontier")
+                    self.display(1, self.frontier_stats())
                     return self.path
                 else:
-                    self.display(4,f"Expanding: {self.path} (cost: {self.path.cost})")
+                    if self.handlers:
+                        self.emit('expand', path=self.path)
+                    self.display(4, Lazy(lambda: f"Expanding: {self.path} (cost: {self.path.cost})"))
                     neighs = self.problem.neighbors(self.path.end())
-                    self.display(2,f"Expanding: {self.path} with neighbors {neighs}")
+                    self.display(2, Lazy(lambda: f"Expanding: {self.path} with neighbors {neighs}"))
                     for arc in neighs:
                         self.add_to_frontier(Path(self.path,arc))
-                    self.display(3, f"New frontier: {[p.end() for p in self.frontier]}")
+                    self.display(3, Lazy(lambda: f"New frontier: {[p.end() for p in self.frontier]}"))
+            elif self.handlers:
+                self.emit('prune', path=self.path)
         self.display(0,"No (more) solutions. Total of",
                      self.num_expanded,"paths expanded.")
 
+    def stats(self):
+        """returns the Search_stats of the search so far; the duplicates
+        are the paths not added to the frontier"""
+        stats = super().stats()
+        stats.generated += self.num_pruned
+        stats.duplicates = self.num_pruned
+        stats.peak_explored = len(self.explored)
+        stats.memory = approximate_memory(stats.peak_frontier, len(self.explored)+len(self.best_g))
+        return stats
+
+    def frontier_stats(self):
+        """returns a string giving the peak size of the frontier,
+        the heap operations per expansion, and the number of pruned paths"""
+        ops = self.frontier.num_heap_ops()
+        return (f"Peak frontier size: {self.frontier.max_size}, "
+                f"heap operations per expansion: {ops/max(self.num_expanded,1):.2f}, "
+                f"duplicate paths not added: {self.num_pruned}, "
+                f"heuristic evaluations: {self.num_heuristic_calls}"
+                + (f" (saved: {self.num_heuristic_saved()})" if self.lazy else ""))
+
 # from searchGeneric import test
 # if __name__ == "__main__":
 #     test(SearcherMPP)
@@ -37,18 +37,25 @@ class Search_problem(Displayable):
         Returns 0 if not overridden."""
         return 0
 
+    def integer_costs(self):
+        """is True if all arc costs are integers (then the searchers can use
+        a bucket frontier). Returns False if not overridden."""
+        return False
+
 class Arc(object):
     """An arc consists of 
        a from_node and a to_node node 
        a (non-negative) cost
        an (optional) action
     """
+    __slots__ = ('from_node', 'to_node', 'cost', 'action')   # no per-arc __dict__
+
     def __init__(self, from_node, to_node, cost=1, action=None):
         self.from_node = from_node
         self.to_node = to_node
         self.cost = cost
-        assert cost >= 0, (f"Cost cannot be negative: {self}, cost={cost}")
         self.action = action
+        assert cost >= 0, (f"Cost cannot be negative: {self}, cost={cost}")
 
     def __repr__(self):
         """string representation of an arc"""
@@ -69,7 +76,8 @@ class Search_problem_from_explicit_graph(Search_problem):
         * start node
         * list or set of marine_goal nodes
         * hmap: dictionary that maps each node into its heuristic value.
-        * positions: dictionary that maps each node into its (x,y) position
+        * positions: dictionary that maps each node into its (x,y) position;
+          if None, random positions are chosen when the graph is first shown
         """
         self.title = title
         self.neighs = {}
@@ -82,10 +90,7 @@ class Search_problem_from_explicit_graph(Search_problem):
         self.start = start
         self.goals = goals
         self.hmap = hmap
-        if positions is None:
-            self.positions = {node:(random.random(),random.random()) for node in nodes}
-        else:
-            self.positions = positions
+        self.positions = positions
 
     def start_node(self):
         """returns start node"""
@@ -106,6 +111,10 @@ class Search_problem_from_explicit_graph(Search_problem):
             return self.hmap[node]
         else:
             return 0
+
+    def integer_costs(self):
+        """is True if all arc costs are integers"""
+        return all(isinstance(arc.cost, int) for arc in self.arcs)
         
     def __repr__(self):
         """returns a string representation of the search problem"""
@@ -126,6 +135,8 @@ class Search_problem_from_explicit_graph(Search_problem):
         self.show_graph(ax, node_color)
 
     def show_graph(self, ax, node_color='orange'): 
+        if self.positions is None:
+            self.positions = {node:(random.random(),random.random()) for node in self.nodes}
         bbox = dict(boxstyle="round4,pad=1.0,rounding_size=0.5",facecolor=node_color)
         for arc in self.arcs:
             self.show_arc(ax, arc)
@@ -156,7 +167,8 @@ class Search_problem_from_explicit_graph(Search_problem):
 
 class Path(object):
     """A path is either a node or a path followed by an arc"""
-    
+    __slots__ = ('initial', 'arc', 'cost')   # no per-path __dict__
+
     def __init__(self,initial,arc=None):
         """initial is either a node (in which case arc is None) or
         a path (in which case arc is an object of type Arc)"""
@@ -189,13 +201,44 @@ class Path(object):
         """
         if self.arc is not None:
             yield from self.initial.nodes()
-        
+
+    def start(self):
+        """returns the node at the start of the path"""
+        current = self
+        while current.arc is not None:
+            current = current.initial
+        return current.initial
+
+    def arcs(self):
+        """returns the list of arcs of the path, from the start.
+        The path is walked in a loop, so long paths do not reach
+        the recursion limit."""
+        arcs = []
+        current = self
+        while current.arc is not None:
+            arcs.append(current.arc)
+            current = current.initial
+        arcs.reverse()
+        return arcs
+
+    def __reduce__(self):
+        """pickles the path as its start node and list of arcs"""
+        return (path_from_arcs, (self.start(), self.arcs()))
+
     def __repr__(self):
         """returns a string representation of a path"""
-        if self.arc is None:
-            return str(self.initial)
-        elif self.arc.action:
-            return f"{self.initial}\n   --{self.arc.action}--> {self.arc.to_node}"
-        else:
-            return f"{self.initial} --> {self.arc.to_node}"
+        res = [str(self.start())]
+        for arc in self.arcs():
+            if arc.action:
+                res.append(f"\n   --{arc.action}--> {arc.to_node}")
+            else:
+                res.append(f" --> {arc.to_node}")
+        return "".join(res)
+
+def path_from_arcs(start, arcs):
+    """returns the path from node start along the list of arcs"""
+    path = Path(start)
+    for arc in arcs:
+        path = Path(path, arc)
+    return path
 
@@ -0,0 +1,184 @@
+# searchQueries.py - Batched shortest-path queries on explicit graphs
+
+import heapq
+from collections import OrderedDict
+from library.display import Displayable
+from library.searchProblem import Path
+
+class Shortest_path_tree(object):
+    """A shortest-path tree from a root node (or to it, if backward is
+    True), grown by Dijkstra's algorithm only as far as needed: grow(nodes)
+    continues the search until all of nodes are settled (or no more can be).
+    For a forward tree, best[n] is the cheapest Path from the root to n;
+    for a backward tree, best[n] is (cost, arc) where arc is the first arc
+    of a cheapest path from n to the root.
+    """
+    def __init__(self, root, arcs_of, backward=False):
+        """arcs_of(n) returns the arcs from n (into n if backward)"""
+        self.root = root
+        self.arcs_of = arcs_of
+        self.backward = backward
+        self.best = {root: (0, None) if backward else Path(root)}
+        self.settled = set()
+        self.frontier = [(0, 0, root)]   # (cost, tie-breaker, node)
+        self.num_added = 1
+        self.num_expanded = 0
+
+    def cost(self, node):
+        entry = self.best[node]
+        return entry[0] if self.backward else entry.cost
+
+    def complete(self):
+        return not self.frontier
+
+    def grow(self, nodes):
+        """settles nodes; returns the number of nodes expanded"""
+        remaining = {n for n in nodes if n not in self.settled}
+        expanded = 0
+        while remaining and self.frontier:
+            (cost, _, node) = heapq.heappop(self.frontier)
+            if node in self.settled:
+                continue
+            self.settled.add(node)
+            remaining.discard(node)
+            expanded += 1
+            for arc in self.arcs_of(node):
+                other = arc.from_node if self.backward else arc.to_node
+                new_cost = cost + arc.cost
+                if other not in self.best or new_cost < self.cost(other):
+                    self.best[other] = ((new_cost, arc) if self.backward
+                                        else Path(self.best[node], arc))
+                    heapq.heappush(self.frontier, (new_cost, self.num_added, other))
+                    self.num_added += 1
+        self.num_expanded += expanded
+        return expanded
+
+    def path(self, node):
+        """returns the cheapest Path between the root and node (from node
+        if backward), or None if there is none. node must have been grown."""
+        if node not in self.settled:
+            return None
+        if not self.backward:
+            return self.best[node]
+        path = Path(node)
+        while path.end() != self.root:
+            path = Path(path, self.best[path.end()][1])
+        return path
+
+class Path_queries(Displayable):
+    """Answers many shortest-path queries on the same graph, a
+    Search_problem_from_explicit_graph (its start, goals and heuristic
+    are ignored). Queries are answered from shortest-path trees, kept in
+    a cache of at most max_trees trees, least recently used first out.
+    A batch of queries is grouped so that one Dijkstra search from a
+    start (or backward from a goal) answers all the queries with that
+    start (or goal).
+    """
+    def __init__(self, graph, max_trees=16):
+        self.graph = graph
+        self.max_trees = max_trees
+        self.trees = OrderedDict()   # (root, backward) -> Shortest_path_tree
+        self.into = None             # node -> list of arcs into node
+        self.group_size = {}         # tree key -> number of queries it answered in this batch
+        self.num_trees_built = 0
+        self.num_answered_from_cache = 0
+        self.num_expanded = 0
+
+    def arcs_into(self, node):
+        if self.into is None:
+            self.into = {n:[] for n in self.graph.neighs}
+            for arc in self.graph.arcs:
+                self.into[arc.to_node].append(arc)
+        return self.into[node]
+
+    def tree(self, root, backward):
+        """returns the tree for root from the cache, or a new one"""
+        key = (root, backward)
+        if key in self.trees:
+            self.trees.move_to_end(key)
+            return self.trees[key]
+        tree = Shortest_path_tree(root, self.arcs_into if backward else self.graph.neighbors,
+                                  backward)
+        self.num_trees_built += 1
+        self.trees[key] = tree
+        while len(self.trees) > self.max_trees:
+            # the least recently used of the trees least used in this batch
+            victim = min(self.trees, key=lambda k: (k == key, self.group_size.get(k, 0)))
+            del self.trees[victim]
+        return tree
+
+    def cached_answer(self, start, goal):
+        """returns (True, path) if a cached tree answers the query without
+        more search, otherwise (False, None)"""
+        for (root, other, backward) in ((start, goal, False), (goal, start, True)):
+            tree = self.trees.get((root, backward))
+            if tree is not None and (other in tree.settled or tree.complete()):
+                self.trees.move_to_end((root, backward))
+                return (True, tree.path(other))
+        return (False, None)
+
+    def batch(self, queries):
+        """returns the list of the cheapest Paths for queries, a list of
+        (start, goal) pairs (None for a pair with no path)"""
+        answers = [None]*len(queries)
+        (num_built, num_expanded) = (self.num_trees_built, self.num_expanded)
+        num_from_cache = 0
+        self.group_size = {}
+        unanswered = []
+        for (i, (start, goal)) in enumerate(queries):
+            (found, path) = self.cached_answer(start, goal)
+            if found:
+                answers[i] = path
+                num_from_cache += 1
+            else:
+                unanswered.append(i)
+        # the queries with each start (or goal), grouped in one pass
+        groups = {}
+        for i in unanswered:
+            (start, goal) = queries[i]
+            groups.setdefault((start, False), []).append(i)
+            groups.setdefault((goal, True), []).append(i)
+        remaining = {key:len(group) for (key, group) in groups.items()}
+        largest = [(-n, order, key) for (order, (key, n)) in enumerate(remaining.items())]
+        heapq.heapify(largest)   # an entry is stale if its size is not remaining[key]
+        answered = set()
+        while largest:
+            # the start or goal that is in the most unanswered queries
+            (size, order, key) = heapq.heappop(largest)
+            if -size != remaining[key]:
+                if remaining[key]:
+                    heapq.heappush(largest, (-remaining[key], order, key))
+                continue
+            (root, backward) = key
+            group = [i for i in groups[key] if i not in answered]
+            self.group_size[key] = len(group)
+            tree = self.tree(root, backward)
+            others = [queries[i][0 if backward else 1] for i in group]
+            self.num_expanded += tree.grow(others)
+            for (i, other) in zip(group, others):
+                answers[i] = tree.path(other)
+                answered.add(i)
+                remaining[(other, not backward)] -= 1
+            remaining[key] = 0
+            self.display(2, f"{'to' if backward else 'from'} {root}: {len(group)} queries")
+        for key in sorted(self.group_size, key=self.group_size.get):
+            if key in self.trees:
+                self.trees.move_to_end(key)   # the largest groups are kept longest
+        self.num_answered_from_cache += num_from_cache
+        self.display(1, len(queries), "queries:", self.num_trees_built-num_built, "trees built,",
+                     num_from_cache, "answers from cache,",
+                     self.num_expanded-num_expanded, "nodes expanded")
+        return answers
+
+    def query(self, start, goal):
+        """returns the cheapest Path from start to goal, or None"""
+        return self.batch([(start, goal)])[0]
+
+# from library.searchBenchmark import random_graph
+# import random
+# graph = random_graph(10**4)
+# queries = [(random.randrange(10**4), random.randrange(10**4)) for i in range(5)]
+# queries += [(0, goal) for goal in range(100)]    # all answered by one search
+# pq = Path_queries(graph)
+# paths = pq.batch(queries)
+# pq.batch(queries)    # all answered from cache
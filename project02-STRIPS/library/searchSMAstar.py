@@ -0,0 +1,181 @@
+# searchSMAstar.py - Simplified memory-bounded A* search
+
+import heapq
+from library.display import Lazy
+from library.searchGeneric import Searcher
+from library.searchProblem import Path
+
+class SMA_node(object):
+    """A node of the search tree kept by SMAStarSearcher"""
+    __slots__ = ('path', 'f', 'depth', 'parent', 'children', 'forgotten',
+                 'expanded', 'version')
+    def __init__(self, path, f, depth, parent):
+        self.path = path
+        self.f = f                # lowest known value of a path through this node
+        self.depth = depth
+        self.parent = parent
+        self.children = {}        # neighbor number -> SMA_node, for children in memory
+        self.forgotten = {}       # neighbor number -> f, for children evicted
+        self.expanded = False
+        self.version = 0          # changed when f or the children change
+
+    def is_leaf(self):
+        return not self.children
+
+    def backed_up_value(self):
+        """the lowest value of the children in memory and those evicted"""
+        return min(min((c.f for c in self.children.values()), default=float("inf")),
+                   min(self.forgotten.values(), default=float("inf")))
+
+class SMAStarSearcher(Searcher):
+    """returns a simplified memory-bounded A* (SMA*) searcher for a problem.
+    Paths can be found by repeatedly calling search().
+    The search tree is cut back to max_nodes nodes after each expansion
+    (it can hold more while the children of a node are added) by evicting
+    the leaves with the highest value (the shallowest amongst equals).
+    The value of an evicted leaf is remembered by its parent, so that child is
+    regenerated if that becomes the best value. Values are backed up
+    from children to parents. With enough memory for the nodes on an
+    optimal path, the first solution found is optimal; with less, it is
+    the best solution whose path fits in memory, if there is one.
+    """
+    def __init__(self, problem, max_nodes=100000):
+        self.max_nodes = max_nodes
+        self.num_nodes = 0        # the number of nodes in memory
+        self.max_stored = 0       # the most nodes in memory at once
+        self.num_evicted = 0
+        self.index = 0            # unique index to break ties in the heaps
+        self.found = set()        # the solutions returned, as tuples of nodes
+        super().__init__(problem)
+
+    def initialize_frontier(self):
+        self.frontier = []        # heap of (f, -depth, index, node, version)
+        self.leaves = []          # heap of (-f, depth, index, node, version)
+
+    def empty_frontier(self):
+        return self.frontier == []
+
+    def add_to_frontier(self, path):
+        """adds the start path as the root of the tree"""
+        self.root = SMA_node(path, self.problem.heuristic(path.end()), 0, None)
+        self.num_nodes = 1
+        self.touch(self.root)
+
+    def touch(self, node):
+        """records that node has changed, putting it back on the heaps
+        it belongs to: the frontier if it is a leaf or has evicted children,
+        the leaves (for eviction) if it is a leaf other than the root"""
+        node.version += 1
+        self.index += 1
+        if node.is_leaf() or node.forgotten:
+            heapq.heappush(self.frontier, (node.f, -node.depth, self.index, node, node.version))
+        if node.is_leaf() and node is not self.root:
+            heapq.heappush(self.leaves, (-node.f, node.depth, self.index, node, node.version))
+
+    def pop_best(self):
+        """removes and returns the node with the lowest value, the deepest
+        amongst equals, or None if there is none"""
+        while self.frontier:
+            (_,_,_,node,version) = heapq.heappop(self.frontier)
+            if version == node.version:
+                return node
+        return None
+
+    def evict_worst_leaf(self):
+        """removes the leaf with the highest value from the tree.
+        Returns False if there is no leaf to remove."""
+        while self.leaves:
+            (_,_,_,node,version) = heapq.heappop(self.leaves)
+            if version == node.version and node.is_leaf():
+                parent = node.parent
+                for (i,child) in parent.children.items():
+                    if child is node:
+                        del parent.children[i]
+                        parent.forgotten[i] = node.f
+                        break
+                node.version += 1     # its heap entries are no longer valid
+                self.num_nodes -= 1
+                self.num_evicted += 1
+                self.touch(parent)
+                return True
+        return False
+
+    def backup(self, node):
+        """records that node has changed and updates the values of its
+        ancestors from their children"""
+        self.touch(node)
+        node = node.parent
+        while node is not None:
+            f = node.backed_up_value()
+            if f == node.f:
+                return
+            node.f = f
+            self.touch(node)
+            node = node.parent
+
+    def search(self):
+        """returns (next) path from the problem's start node
+        to a goal node.
+        Returns None if no path exists within the memory bound.
+        """
+        while True:
+            node = self.pop_best()
+            if node is None or node.f == float("inf"):
+                break
+            self.path = node.path
+            self.num_expanded += 1
+            if self.problem.is_goal(self.path.end()):
+                nodes = tuple(self.path.nodes())
+                node.f = float("inf")    # so that search() finds the next solution
+                self.backup(node)
+                if nodes in self.found:  # it was evicted after it was returned
+                    continue
+                self.found.add(nodes)
+                self.solution = self.path
+                self.emit('solution', path=self.path)
+                self.display(1, f"Solution: {self.path} (cost: {self.path.cost})\n",
+                    self.num_expanded, "paths have been expanded;",
+                    self.max_stored, "nodes were stored at most and",
+                    self.num_evicted, "were evicted")
+                return self.path
+            self.expand(node)
+            while self.num_nodes > self.max_nodes and self.evict_worst_leaf():
+                pass
+        self.display(0,"No (more) solutions. Total of",
+                     self.num_expanded,"paths expanded.")
+
+    def expand(self, node):
+        """adds all of the children of node the first time it is expanded,
+        and afterwards the evicted child with the lowest value"""
+        if self.handlers:
+            self.emit('expand', path=self.path)
+        self.display(4, Lazy(lambda: f"Expanding: {self.path} (cost: {self.path.cost})"))
+        arcs = list(self.problem.neighbors(self.path.end()))
+        if node.expanded:
+            i = min(node.forgotten, key=node.forgotten.get)
+            to_add = [(i, node.forgotten.pop(i))]
+        else:
+            node.expanded = True
+            on_path = set(self.path.nodes())
+            to_add = [(i, 0) for (i,arc) in enumerate(arcs) if arc.to_node not in on_path]
+        for (i,value) in to_add:
+            arc = arcs[i]
+            path = Path(self.path, arc)
+            depth = node.depth+1
+            if depth >= self.max_nodes or (depth == self.max_nodes-1
+                                           and not self.problem.is_goal(arc.to_node)):
+                f = float("inf")     # no room for the path or to extend it
+            else:
+                f = max(value, node.f, path.cost+self.problem.heuristic(arc.to_node))
+            if self.handlers:
+                self.emit('generate', path=path)
+            child = SMA_node(path, f, depth, node)
+            node.children[i] = child
+            self.num_nodes += 1
+            self.touch(child)
+        self.max_stored = max(self.max_stored, self.num_nodes)
+        node.f = node.backed_up_value()   # infinite for a dead end
+        self.backup(node)
+
+# import library.searchExample
+# SMAStarSearcher(searchExample.cyclic_simp_delivery_graph, max_nodes=8).search()
@@ -0,0 +1,206 @@
+# searchStats.py - Statistics and profiling for searchers
+
+import cProfile
+import csv
+import json
+import pstats
+import sys
+import time
+import tracemalloc
+
+class Search_stats(object):
+    """The statistics of a search, as given by the stats() method of a
+    searcher. The times are None unless the search was run by measure().
+    memory is the peak traced by tracemalloc if measure() traced it,
+    otherwise a rough estimate from the peak frontier and explored sizes.
+    """
+    fields = ['searcher', 'problem', 'completed', 'solution_cost', 'expanded', 'generated',
+              'duplicates', 'heuristic_calls', 'peak_frontier', 'peak_explored',
+              'memory', 'search_time', 'expansions_per_second',
+              'neighbors_time', 'heuristic_time', 'queue_time']
+
+    def __init__(self, searcher, generated, expanded, duplicates=0,
+                 peak_frontier=0, peak_explored=0, heuristic_calls=None):
+        self.searcher = type(searcher).__name__
+        self.problem = type(searcher.problem).__name__
+        solution = getattr(searcher, 'solution', None)
+        self.solution_cost = solution.cost if solution is not None else None
+        self.generated = generated
+        self.expanded = expanded
+        self.duplicates = duplicates
+        self.heuristic_calls = heuristic_calls
+        self.peak_frontier = peak_frontier
+        self.peak_explored = peak_explored
+        self.memory = approximate_memory(peak_frontier, peak_explored)
+        self.completed = True    # False if measure() stopped the search
+        self.search_time = None
+        self.neighbors_time = None
+        self.heuristic_time = None
+        self.queue_time = None
+        self.profile = None      # pstats.Stats if measure() profiled the search
+
+    @property
+    def expansions_per_second(self):
+        if not self.search_time:
+            return None
+        return self.expanded/self.search_time
+
+    def as_dict(self):
+        return {field:getattr(self, field) for field in self.fields}
+
+    def __repr__(self):
+        return "Search_stats("+", ".join(f"{field}={value}"
+                    for (field,value) in self.as_dict().items() if value is not None)+")"
+
+    def save_json(self, file_name):
+        """saves the statistics to file_name as a JSON object"""
+        with open(file_name, "w") as f:
+            json.dump(self.as_dict(), f, indent=1)
+
+PATH_BYTES = 56 + 64    # a Path and its entry in the frontier (a tuple in a list)
+NODE_BYTES = 50         # an entry of the explored set or of a dictionary of nodes
+
+def approximate_memory(peak_frontier, peak_explored):
+    """a rough estimate, in bytes, of the memory used by the frontier and
+    the explored nodes (not counting the nodes themselves)"""
+    return peak_frontier*PATH_BYTES + peak_explored*NODE_BYTES
+
+def save_csv(stats_list, file_name):
+    """saves a list of Search_stats to file_name as CSV, one row each"""
+    with open(file_name, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=Search_stats.fields)
+        writer.writeheader()
+        for stats in stats_list:
+            writer.writerow(stats.as_dict())
+
+class Expansion_limit(Exception):
+    """raised to stop a search that has done too many expansions"""
+
+class Timers(object):
+    """Accumulates the time spent in each category. Timed calls can be
+    nested; the time of the inner call is only counted in its category."""
+    def __init__(self):
+        self.totals = {}
+        self.stack = []     # [category, time started or resumed]
+
+    def start(self, category):
+        now = time.perf_counter()
+        if self.stack:
+            self.charge(now)
+        self.stack.append([category, now])
+
+    def stop(self):
+        now = time.perf_counter()
+        self.charge(now)
+        self.stack.pop()
+        if self.stack:
+            self.stack[-1][1] = now
+
+    def charge(self, now):
+        (category, started) = self.stack[-1]
+        self.totals[category] = self.totals.get(category, 0) + now - started
+
+    def timed(self, category, fun):
+        """returns fun with the time of its calls charged to category"""
+        def timed_fun(*args):
+            self.start(category)
+            try:
+                return fun(*args)
+            finally:
+                self.stop()
+        return timed_fun
+
+class Timed_problem(object):
+    """A search problem that forwards to problem, timing the calls to
+    neighbors() and heuristic()"""
+    def __init__(self, problem, timers):
+        self.problem = problem
+        self.timers = timers
+        self.heuristic = timers.timed('heuristic', problem.heuristic)
+
+    def neighbors(self, node):
+        self.timers.start('neighbors')
+        try:
+            neighs = self.problem.neighbors(node)
+            return neighs if isinstance(neighs, list) else list(neighs)
+        finally:
+            self.timers.stop()
+
+    def __getattr__(self, name):
+        return getattr(self.problem, name)
+
+def measure(searcher, timing=True, profile=False, trace_memory=False,
+            max_expansions=None):
+    """runs searcher.search() and returns its Search_stats (the path found
+    is searcher.solution).
+    timing is True to split the time between neighbors(), heuristic() and
+    the frontier operations (adding a path less its heuristic, and popping).
+    profile is True to run it under cProfile; the pstats.Stats are the
+    profile of the result, e.g., result.profile.sort_stats('cumtime').print_stats(10)
+    trace_memory is True to record the peak memory with tracemalloc.
+    max_expansions, if not None, stops the search after that many
+    expansions (using the 'expand' event); completed is then False.
+    Timing, profiling and tracing memory make the search slower.
+    """
+    timers = Timers()
+    problem = searcher.problem
+    if timing:
+        searcher.problem = Timed_problem(problem, timers)
+        searcher.add_to_frontier = timers.timed('queue', searcher.add_to_frontier)
+        searcher.pop_from_frontier = timers.timed('queue', searcher.pop_from_frontier)
+    if trace_memory:
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        base_memory = tracemalloc.get_traced_memory()[0]
+    if max_expansions is not None:
+        def check_limit(searcher, path):
+            if searcher.num_expanded >= max_expansions:
+                raise Expansion_limit()
+        searcher.add_handler('expand', check_limit)
+    completed = True
+    profiler = cProfile.Profile() if profile else None
+    start_time = time.perf_counter()
+    try:
+        if profiler:
+            profiler.enable()
+        searcher.search()
+    except Expansion_limit:
+        completed = False
+    finally:
+        if profiler:
+            profiler.disable()
+        search_time = time.perf_counter() - start_time
+        if timing:
+            searcher.problem = problem
+            del searcher.add_to_frontier
+            del searcher.pop_from_frontier
+        if trace_memory:
+            peak_memory = tracemalloc.get_traced_memory()[1] - base_memory
+            if started_tracing:
+                tracemalloc.stop()
+        if max_expansions is not None:
+            searcher.handlers['expand'].remove(check_limit)
+    stats = searcher.stats()
+    stats.completed = completed
+    stats.search_time = search_time
+    if timing:
+        stats.neighbors_time = timers.totals.get('neighbors', 0)
+        stats.heuristic_time = timers.totals.get('heuristic', 0)
+        stats.queue_time = timers.totals.get('queue', 0)
+    if trace_memory:
+        stats.memory = peak_memory
+    if profiler:
+        stats.profile = pstats.Stats(profiler, stream=sys.stdout)
+    return stats
+
+# from library.searchMPP import SearcherMPP
+# from library.stripsForwardPlanner import Forward_STRIPS
+# from starcraft.starcraftProblem import problem_train_tank
+# searcher = SearcherMPP(Forward_STRIPS(problem_train_tank))
+# searcher.max_display_level = 0
+# stats = measure(searcher, trace_memory=True)
+# stats
+# save_csv([stats], "stats.csv")
+# measure(SearcherMPP(Forward_STRIPS(problem_train_tank)), profile=True).profile.sort_stats('tottime').print_stats(10)
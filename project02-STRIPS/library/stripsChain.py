@@ -0,0 +1,115 @@
+# stripsChain.py - Planning for a chain of subgoals over one compiled domain
+
+from collections import OrderedDict
+import time
+from library.display import Displayable
+from library.searchMPP import SearcherMPP
+from library.searchProblem import path_from_arcs
+from library.stripsForwardPlanner import Forward_STRIPS, Heuristic_cache, state_encoding, zero
+from library.stripsProblem import Planning_problem
+
+class Chain_segment(Forward_STRIPS):
+    """The Forward_STRIPS problem (with Compact_states) for one subgoal of a
+    chain. The successors of states and the heuristic values for the goal
+    are looked up in the caches of the Chained_planner, so work done for
+    earlier segments (or earlier chains with the same subgoal) is reused.
+    """
+    def __init__(self, planner, initial_state, goal):
+        super().__init__(Planning_problem(planner.prob_domain, initial_state, goal),
+                         planner.heur, compact=True)
+        self.planner = planner
+        key = frozenset(goal.items())
+        if key not in planner.heuristic_caches:
+            planner.heuristic_caches[key] = Heuristic_cache(self.state_heuristic,
+                                                            planner.cache_size)
+        self.heuristic_cache = planner.heuristic_caches[key]
+
+    def neighbors(self, state):
+        """the arcs from state, which do not depend on the goal"""
+        successors = self.planner.successors
+        if state in successors:
+            self.planner.successor_hits += 1
+            successors.move_to_end(state)
+            return successors[state]
+        arcs = successors[state] = super().neighbors(state)
+        if len(successors) > self.planner.cache_size:
+            successors.popitem(last=False)
+        return arcs
+
+class Chained_planner(Displayable):
+    """Plans for a sequence of subgoals in prob_domain, each segment
+    starting from the state reached by the previous one. The domain is
+    compiled once (its State_encoding and successor generator are kept
+    with the domain); the successors of states (which do not depend on
+    the goal) and the heuristic values for each goal are kept in caches
+    of at most cache_size states, shared by all the segments and chains.
+    searcher is the searcher class for the segments, e.g., SearcherMPP.
+    If plan_cache (a Plan_cache) is given, the plans of segments are
+    looked up there first and stored there, labelled by planner_name.
+    After solve(), segments is a list with the statistics of each segment.
+    """
+    def __init__(self, prob_domain, heur=zero, searcher=SearcherMPP, cache_size=10**5,
+                 plan_cache=None, planner_name=None):
+        self.prob_domain = prob_domain
+        self.heur = heur
+        self.searcher = searcher
+        self.cache_size = cache_size
+        self.plan_cache = plan_cache
+        self.planner_name = planner_name or f"{searcher.__name__} {getattr(heur, '__name__', heur)}"
+        self.successors = OrderedDict()   # state -> list of arcs
+        self.successor_hits = 0
+        self.heuristic_caches = {}        # frozenset of goal items -> Heuristic_cache
+        self.segments = []
+
+    def search_segment(self, planning_problem):
+        """returns the path for a segment, setting self.last_expanded"""
+        searcher = self.searcher(Chain_segment(self, planning_problem.initial_state,
+                                               planning_problem.goal))
+        searcher.max_display_level = self.max_display_level - 1
+        path = searcher.search()
+        self.last_expanded = searcher.num_expanded
+        return path
+
+    def solve(self, initial_state, subgoals):
+        """returns the path from initial_state (a feature:value dictionary)
+        achieving each of subgoals in turn, or None if a subgoal cannot
+        be achieved from the state reached. The nodes are Compact_states;
+        with no subgoals, the path is just the initial state."""
+        self.segments = []
+        start = state_encoding(self.prob_domain).encode(initial_state)
+        arcs = []
+        state = initial_state
+        for goal in subgoals:
+            (start_time, successor_hits) = (time.perf_counter(), self.successor_hits)
+            problem = Planning_problem(self.prob_domain, state, goal)
+            self.last_expanded = 0
+            if self.plan_cache is not None:
+                segment = self.plan_cache.solve(problem, self.search_segment, self.planner_name,
+                                                compact=True)
+            else:
+                segment = self.search_segment(problem)
+            self.segments.append({'goal': goal,
+                                  'cost': None if segment is None else segment.cost,
+                                  'expanded': self.last_expanded,
+                                  'successor_hits': self.successor_hits - successor_hits,
+                                  'time': time.perf_counter() - start_time})
+            if segment is None:
+                self.display(1, "No solution for subgoal", goal)
+                return None
+            self.display(1, f"Subgoal {goal}: cost {segment.cost},",
+                         self.last_expanded, "expanded")
+            arcs.extend(segment.arcs())
+            state = dict(segment.end().assignment)
+        path = path_from_arcs(start, arcs)
+        self.display(1, f"Total cost {path.cost},",
+                     self.total_expanded(), "expanded in", len(self.segments), "segments")
+        return path
+
+    def total_expanded(self):
+        return sum(segment['expanded'] for segment in self.segments)
+
+# from starcraft.starcraftProblem import domain_train_tank, initial_state_train_tank, problem_train_tank_subgoals
+# planner = Chained_planner(domain_train_tank)
+# planner.solve(initial_state_train_tank, problem_train_tank_subgoals)
+# planner.segments    # cost, expansions and time of each segment
+# planner.total_expanded()
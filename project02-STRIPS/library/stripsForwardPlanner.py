@@ -8,8 +8,14 @@
 # Attribution-NonCommercial-ShareAlike 4.0 International License.
 # See: https://creativecommons.org/licenses/by-nc-sa/4.0/deed.en
 
+from collections import OrderedDict
+from collections.abc import Mapping
+import functools
+import os
+import random
+import weakref
 from library.searchProblem import Arc, Search_problem
-from library.stripsProblem import Strips, STRIPS_domain
+from library.stripsProblem import Strips, STRIPS_domain, domain_fingerprint
 
 class State(object):
     def __init__(self,assignment):
@@ -24,30 +30,313 @@ class State(object):
     def __str__(self):
         return str(self.assignment)
         
+class Successor_generator(object):
+    """A decision tree over the preconditions of the actions of a domain.
+    Each internal node tests one feature; its children are indexed by the
+    value of that feature, plus a "don't care" child for the actions that
+    have no precondition on the feature. Following the tree for a state
+    only visits actions whose preconditions all hold.
+    """
+    def __init__(self, prob_domain, encoding=None):
+        """compiles the actions of prob_domain into a decision tree.
+        If encoding (a State_encoding) is given, the tree tests feature
+        indexes and value codes, and applicable() takes the values of a
+        Compact_state instead of a feature:value dictionary.
+        """
+        self.actions = list(prob_domain.actions)
+        if encoding is None:
+            self.preconds = [act.preconds for act in self.actions]
+        else:
+            self.preconds = [encoding.encode_partial(act.preconds)
+                                 for act in self.actions]
+        # test the features mentioned in the most preconditions first
+        counts = {}
+        for preconds in self.preconds:
+            for feat in preconds:
+                counts[feat] = counts.get(feat,0)+1
+        self.features = sorted(counts, key=lambda f: -counts[f])
+        self.tree = self.build(list(range(len(self.actions))), 0)
+
+    def build(self, act_indexes, feat_index):
+        """returns the tree for the actions with indexes act_indexes,
+        where the features before feat_index have already been tested.
+        A leaf is (None, act_indexes, None); an internal node is
+        (feature, value:subtree dictionary, don't-care subtree).
+        """
+        while feat_index < len(self.features):
+            feat = self.features[feat_index]
+            by_value = {}
+            dont_care = []
+            for i in act_indexes:
+                preconds = self.preconds[i]
+                if feat in preconds:
+                    by_value.setdefault(preconds[feat],[]).append(i)
+                else:
+                    dont_care.append(i)
+            if by_value:
+                return (feat,
+                        {val:self.build(acts, feat_index+1)
+                             for (val,acts) in by_value.items()},
+                        self.build(dont_care, feat_index+1) if dont_care else None)
+            feat_index += 1
+        return (None, act_indexes, None)
+
+    def applicable(self, state_asst):
+        """returns the list of actions possible in state_asst,
+        in the same order as the actions of the domain"""
+        return [self.actions[i] for i in self.applicable_indexes(state_asst)]
+
+    def applicable_indexes(self, state_asst):
+        """returns the sorted list of the indexes of the actions
+        possible in state_asst"""
+        found = []
+        stack = [self.tree]
+        while stack:
+            (feat, children, dont_care) = stack.pop()
+            if feat is None:
+                found.extend(children)
+            else:
+                child = children.get(state_asst[feat])
+                if child is not None:
+                    stack.append(child)
+                if dont_care is not None:
+                    stack.append(dont_care)
+        found.sort()
+        return found
+
+def successor_generator(prob_domain):
+    """returns the Successor_generator for prob_domain.
+    It is built once and stored with the domain; it is rebuilt if the
+    domain has changed since (its domain_fingerprint is different)."""
+    fingerprint = domain_fingerprint(prob_domain)
+    gen = getattr(prob_domain, "successor_generator", None)
+    if gen is None or gen.fingerprint != fingerprint:
+        gen = Successor_generator(prob_domain)
+        gen.fingerprint = fingerprint
+        prob_domain.successor_generator = gen
+    return gen
+
+# key -> State_encoding, used to unpickle Compact_states; an encoding is
+# removed when it is no longer used (e.g., its domain is deleted)
+state_encodings = weakref.WeakValueDictionary()
+
+class State_encoding(object):
+    """An interning of the features and values of a planning domain.
+    Features are numbered 0..n-1 and the values of each feature are
+    numbered in the order they are first seen, so that a state can be
+    stored as a tuple of small integers. Each (feature, value code) pair
+    has a random 64-bit Zobrist key; the hash of a state is the xor of
+    the keys of its values, so a successor's hash is updated from the
+    effects of an action only.
+    """
+    def __init__(self, prob_domain, seed=0):
+        self.key = f"{os.getpid()}-{id(self)}"
+        state_encodings[self.key] = self
+        self.rand = random.Random(seed)
+        self.features = list(prob_domain.feature_domain_dict)
+        self.feature_index = {feat:i for (i,feat) in enumerate(self.features)}
+        self.values = [[] for feat in self.features]      # code -> value
+        self.value_codes = [{} for feat in self.features] # value -> code
+        self.zobrist = [[] for feat in self.features]     # code -> key
+        for (i,feat) in enumerate(self.features):
+            for val in prob_domain.feature_domain_dict[feat]:
+                self.code(i,val)
+        self.actions = list(prob_domain.actions)
+        self.action_effects = [tuple(self.encode_partial(act.effects).items())
+                                   for act in self.actions]
+        self.successors = Successor_generator(prob_domain, self)
+
+    def __setstate__(self, state):
+        """registers an unpickled encoding (e.g., in a spawned process)
+        so that the Compact_states sent to that process can be unpickled"""
+        self.__dict__.update(state)
+        state_encodings.setdefault(self.key, self)
+
+    def code(self, feat_index, val):
+        """returns the code of value val of the feature with index feat_index.
+        Values not in the domain of the feature are given new codes."""
+        codes = self.value_codes[feat_index]
+        if val not in codes:
+            codes[val] = len(self.values[feat_index])
+            self.values[feat_index].append(val)
+            self.zobrist[feat_index].append(self.rand.getrandbits(64))
+        return codes[val]
+
+    def encode_partial(self, asst):
+        """returns the feature_index:code dictionary for feature:value
+        dictionary asst (e.g., preconditions, effects or a goal)"""
+        return {self.feature_index[feat]:self.code(self.feature_index[feat],val)
+                    for (feat,val) in asst.items()}
+
+    def encode(self, asst):
+        """returns the Compact_state for full assignment asst"""
+        return self.state(tuple(self.code(i,asst[feat])
+                                    for (i,feat) in enumerate(self.features)))
+
+    def state(self, values):
+        """returns the Compact_state for the tuple of value codes values"""
+        hash_value = 0
+        for (i,c) in enumerate(values):
+            hash_value ^= self.zobrist[i][c]
+        return Compact_state(values, hash_value, self)
+
+    def successor(self, state, act_index):
+        """returns the Compact_state that results from doing the action
+        with index act_index in Compact_state state"""
+        values = list(state.values)
+        hash_value = state.hash_value
+        for (i,c) in self.action_effects[act_index]:
+            old = values[i]
+            if old != c:
+                keys = self.zobrist[i]
+                hash_value ^= keys[old]^keys[c]
+                values[i] = c
+        return Compact_state(tuple(values), hash_value, self)
+
+def state_encoding(prob_domain):
+    """returns the State_encoding for prob_domain, built once and stored
+    with the domain, as for successor_generator."""
+    fingerprint = domain_fingerprint(prob_domain)
+    enc = getattr(prob_domain, "state_encoding", None)
+    if enc is None or enc.fingerprint != fingerprint:
+        enc = State_encoding(prob_domain)
+        enc.fingerprint = fingerprint
+        prob_domain.state_encoding = enc
+    return enc
+
+class Compact_state(object):
+    """A state stored as a tuple of value codes of a State_encoding.
+    It can be used wherever a State is: it is hashable and comparable,
+    and its assignment is a read-only feature:value mapping.
+    """
+    __slots__ = ('values', 'hash_value', 'encoding')
+    def __init__(self, values, hash_value, encoding):
+        self.values = values
+        self.hash_value = hash_value
+        self.encoding = encoding
+    def __hash__(self):
+        return self.hash_value
+    def __eq__(self,st):
+        if not isinstance(st, Compact_state):
+            return NotImplemented
+        return self.values == st.values and (self.encoding is st.encoding
+                                             or self.encoding.key == st.encoding.key)
+    @property
+    def assignment(self):
+        return Compact_assignment(self)
+    def __str__(self):
+        return str(dict(self.assignment))
+    def __reduce__(self):
+        """pickles the key of the encoding rather than the encoding, so that
+        states are small when sent between processes. The receiving process
+        must have the encoding, e.g., by being forked after it was built."""
+        return (compact_state, (self.values, self.hash_value, self.encoding.key))
+
+def compact_state(values, hash_value, encoding_key):
+    """returns the Compact_state for an unpickled state"""
+    return Compact_state(values, hash_value, state_encodings[encoding_key])
+
+class Compact_assignment(Mapping):
+    """The feature:value mapping of a Compact_state. Lookups decode a
+    single value; use dict() to get a full copy."""
+    __slots__ = ('state',)
+    def __init__(self, state):
+        self.state = state
+    def __getitem__(self, feat):
+        enc = self.state.encoding
+        i = enc.feature_index[feat]
+        return enc.values[i][self.state.values[i]]
+    def __iter__(self):
+        return iter(self.state.encoding.features)
+    def __len__(self):
+        return len(self.state.values)
+
 def zero(*args,**nargs):
     """always returns 0"""
     return 0
 
+def goal_specialized(for_goal):
+    """makes a heuristic heur(state,goal) from for_goal(goal), which does
+    the work that depends only on the goal and returns a function of the
+    state. Forward_STRIPS calls heur.for_goal once for its goal; other
+    callers get the function for the last goal used.
+    Can be used as a decorator.
+    """
+    last = [None, None]    # the last goal and its function
+    @functools.wraps(for_goal)
+    def heur(state, goal):
+        if goal is not last[0]:
+            last[:] = [goal, for_goal(goal)]
+        return last[1](state)
+    heur.for_goal = for_goal
+    return heur
+
+class Heuristic_cache(object):
+    """A memo of the values of fun(state), keyed on the state (so by its hash),
+    of at most max_size values; the least recently used is evicted first.
+    """
+    def __init__(self, fun, max_size=100000):
+        self.fun = fun
+        self.max_size = max_size
+        self.values = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __call__(self, state):
+        values = self.values
+        if state in values:
+            self.hits += 1
+            values.move_to_end(state)
+            return values[state]
+        self.misses += 1
+        value = values[state] = self.fun(state)
+        if len(values) > self.max_size:
+            values.popitem(last=False)
+        return value
+
+    def __repr__(self):
+        return (f"Heuristic_cache({len(self.values)} values, "
+                f"{self.hits} hits, {self.misses} misses)")
+
 class Forward_STRIPS(Search_problem):
     """A search problem from a planning problem where:
     * a node is a state
     * the dynamics are specified by the STRIPS representation of actions
     """
-    def __init__(self, planning_problem, heur=zero):
+    def __init__(self, planning_problem, heur=zero, compact=False,
+                 cache_size=0, specialize=True):
         """creates a forward search space from a planning problem.
         heur(state,marine_goal) is a heuristic function,
            an underestimate of the cost from state to marine_goal, where
            both state and goals are feature:value dictionaries.
+        compact is True if states are Compact_states rather than States.
+        cache_size is the number of heuristic values of states remembered
+           (least recently used evicted first); 0 for no cache.
+        specialize is True if the goal-dependent part of heur is done
+           once (when heur has for_goal; see goal_specialized).
         """
         self.prob_domain = planning_problem.prob_domain
-        self.initial_state = State(planning_problem.initial_state)
         self.goal = planning_problem.goal
         self.heur = heur
+        self.goal_heur = (heur.for_goal(self.goal)
+                          if specialize and hasattr(heur, 'for_goal') else None)
+        self.heuristic_cache = (Heuristic_cache(self.state_heuristic, cache_size)
+                                if cache_size else None)
+        self.compact = compact
+        if compact:
+            self.encoding = state_encoding(self.prob_domain)
+            self.initial_state = self.encoding.encode(planning_problem.initial_state)
+            self.goal_codes = tuple(self.encoding.encode_partial(self.goal).items())
+        else:
+            self.initial_state = State(planning_problem.initial_state)
+            self.successors = successor_generator(self.prob_domain)
 
     def is_goal(self, state):
         """is True if node is a marine_goal.
 
         Every marine_goal feature has the same value in the state and the marine_goal."""
+        if self.compact:
+            return all(state.values[i]==c for (i,c) in self.goal_codes)
         return all(state.assignment[prop]==self.goal[prop]
                    for prop in self.goal)
 
@@ -57,9 +346,22 @@ class Forward_STRIPS(Search_problem):
 
     def neighbors(self,state):
         """returns neighbors of state in this problem"""
+        if self.compact:
+            enc = self.encoding
+            return [ Arc(state, enc.successor(state,i), enc.actions[i].cost, enc.actions[i])
+                     for i in enc.successors.applicable_indexes(state.values)]
         return [ Arc(state, self.effect(act,state.assignment), act.cost, act)
-                 for act in self.prob_domain.actions
-                 if self.possible(act,state.assignment)]
+                 for act in self.successors.applicable(state.assignment)]
+
+    def applicable_actions(self,state):
+        """returns the list of actions possible in state"""
+        if self.compact:
+            return self.encoding.successors.applicable(state.values)
+        return self.successors.applicable(state.assignment)
+
+    def integer_costs(self):
+        """is True if all action costs are integers"""
+        return all(isinstance(act.cost, int) for act in self.prob_domain.actions)
 
     def possible(self,act,state_asst):
         """True if act is possible in state.
@@ -79,6 +381,14 @@ class Forward_STRIPS(Search_problem):
         the heuristic is an (under)estimate of the cost
         of going from the state to the top-level marine_goal.
         """
+        if self.heuristic_cache is not None:
+            return self.heuristic_cache(state)
+        return self.state_heuristic(state)
+
+    def state_heuristic(self,state):
+        """the heuristic value of state, not cached"""
+        if self.goal_heur is not None:
+            return self.goal_heur(state.assignment)
         return self.heur(state.assignment, self.goal)
 
 # from searchBranchAndBound import DF_branch_and_bound
@@ -87,6 +397,8 @@ class Forward_STRIPS(Search_problem):
 
 # SearcherMPP(Forward_STRIPS(stripsProblem.problem1)).search()  #A* with MPP
 # DF_branch_and_bound(Forward_STRIPS(stripsProblem.problem1),10).search() #B&B
+# SearcherMPP(Forward_STRIPS(stripsProblem.problem1, compact=True)).search() #A* with integer-coded states
+# SearcherMPP(Forward_STRIPS(stripsProblem.problem1, cache_size=1000)).search() #memoized heuristic
 # To find more than one plan:
 # s1 = SearcherMPP(Forward_STRIPS(stripsProblem.problem1))  #A*
 # s1.search()  #find another plan
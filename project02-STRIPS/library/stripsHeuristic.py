@@ -0,0 +1,167 @@
+# stripsHeuristic.py - Domain-independent delete-relaxation heuristics for STRIPS
+
+import heapq
+from library.stripsProblem import domain_fingerprint
+
+class Delete_relaxation(object):
+    """Heuristics computed from the delete relaxation of a STRIPS_domain,
+    where a state is the set of facts (feature,value) that have been
+    reached and actions only ever add facts.
+    * h_max is the cost of the most costly goal fact (admissible)
+    * h_add is the sum of the costs of the goal facts (not admissible)
+    * h_ff is the cost of a relaxed plan extracted from the h_add
+      supporters (not admissible)
+    Each method has the heur(state,goal) signature expected by
+    Forward_STRIPS, e.g. Forward_STRIPS(problem, delete_relaxation(domain).h_ff)
+    """
+    def __init__(self, prob_domain):
+        """compiles the actions of prob_domain into precondition counters"""
+        self.actions = list(prob_domain.actions)
+        self.fact_index = {}     # (feature,value) -> fact number
+        self.preconds = []       # action number -> list of fact numbers
+        self.effects = []        # action number -> list of fact numbers
+        self.precond_of = []     # fact number -> list of action numbers
+        for act in self.actions:
+            self.preconds.append([self.fact(f,v) for (f,v) in act.preconds.items()])
+            self.effects.append([self.fact(f,v) for (f,v) in act.effects.items()])
+        for (a,pre) in enumerate(self.preconds):
+            for f in pre:
+                self.precond_of[f].append(a)
+        self.num_preconds = [len(pre) for pre in self.preconds]
+        self.no_preconds = [a for (a,n) in enumerate(self.num_preconds) if n==0]
+        self.last_goal = None
+
+    def fact(self, feat, val):
+        """returns the number of fact (feat,val), adding it if it is new"""
+        fact = (feat,val)
+        if fact not in self.fact_index:
+            self.fact_index[fact] = len(self.precond_of)
+            self.precond_of.append([])
+        return self.fact_index[fact]
+
+    def goal_facts(self, goal):
+        """returns the list of fact numbers of goal.
+        The last goal is remembered, as a search uses the same goal throughout."""
+        if goal is not self.last_goal:
+            self.last_goal = goal
+            self.last_goal_facts = [self.fact(f,v) for (f,v) in goal.items()]
+        return self.last_goal_facts
+
+    def fact_costs(self, state, goal_facts, use_max):
+        """returns (cost, supporter) where cost maps each fact reached to
+        its relaxed cost from state, and supporter maps each fact not in
+        state to the action that achieves it most cheaply.
+        The cost of an action is its cost plus the maximum (if use_max)
+        or sum (otherwise) of the costs of its preconditions.
+        Stops once all of the goal_facts have been reached.
+        """
+        cost = {}
+        supporter = {}
+        done = set()
+        to_reach = set(goal_facts)
+        remaining = self.num_preconds[:]    # unreached preconditions per action
+        pre_cost = [0]*len(self.actions)    # max or sum of precondition costs
+        heap = []
+        for (feat,val) in state.items():
+            f = self.fact_index.get((feat,val))
+            if f is not None:
+                cost[f] = 0
+                heap.append((0,f))
+        to_reach.difference_update(cost)
+        for a in self.no_preconds:
+            self.achieve(a, 0, cost, supporter, heap)
+        heapq.heapify(heap)
+        while heap and to_reach:
+            (c,f) = heapq.heappop(heap)
+            if f in done:
+                continue
+            done.add(f)
+            to_reach.discard(f)
+            for a in self.precond_of[f]:
+                if use_max:
+                    if c > pre_cost[a]:
+                        pre_cost[a] = c
+                else:
+                    pre_cost[a] += c
+                remaining[a] -= 1
+                if remaining[a] == 0:
+                    self.achieve(a, pre_cost[a], cost, supporter, heap)
+        return cost, supporter
+
+    def achieve(self, a, pre_cost, cost, supporter, heap):
+        """updates the costs of the effects of action a, where the
+        preconditions of a cost pre_cost"""
+        c = pre_cost + self.actions[a].cost
+        for e in self.effects[a]:
+            if c < cost.get(e, float("inf")):
+                cost[e] = c
+                supporter[e] = a
+                heapq.heappush(heap, (c,e))
+
+    def reachable(self, state, excluded=frozenset()):
+        """returns the set of fact numbers reachable from state in the
+        relaxation, without using the actions with numbers in excluded"""
+        reached = {self.fact_index[fv] for fv in state.items() if fv in self.fact_index}
+        remaining = self.num_preconds[:]
+        to_do = list(reached)
+        for a in self.no_preconds:
+            if a not in excluded:
+                to_do.extend(f for f in self.effects[a] if f not in reached)
+                reached.update(self.effects[a])
+        while to_do:
+            f = to_do.pop()
+            for a in self.precond_of[f]:
+                remaining[a] -= 1
+                if remaining[a] == 0 and a not in excluded:
+                    for e in self.effects[a]:
+                        if e not in reached:
+                            reached.add(e)
+                            to_do.append(e)
+        return reached
+
+    def h_max(self, state, goal):
+        """the maximum over goal facts of their h_max cost"""
+        goal_facts = self.goal_facts(goal)
+        cost,_ = self.fact_costs(state, goal_facts, use_max=True)
+        return max((cost.get(f, float("inf")) for f in goal_facts), default=0)
+
+    def h_add(self, state, goal):
+        """the sum over goal facts of their h_add cost"""
+        goal_facts = self.goal_facts(goal)
+        cost,_ = self.fact_costs(state, goal_facts, use_max=False)
+        return sum(cost.get(f, float("inf")) for f in goal_facts)
+
+    def h_ff(self, state, goal):
+        """the cost of a relaxed plan for goal, found by chaining back
+        from the goal facts through the h_add supporters"""
+        goal_facts = self.goal_facts(goal)
+        cost,supporter = self.fact_costs(state, goal_facts, use_max=False)
+        if any(f not in cost for f in goal_facts):
+            return float("inf")
+        plan = set()
+        to_support = [f for f in goal_facts if f in supporter]
+        while to_support:
+            a = supporter[to_support.pop()]
+            if a not in plan:
+                plan.add(a)
+                to_support.extend(f for f in self.preconds[a] if f in supporter)
+        return sum(self.actions[a].cost for a in plan)
+
+def delete_relaxation(prob_domain):
+    """returns the Delete_relaxation for prob_domain.
+    It is built once and stored with the domain; it is rebuilt if the
+    domain has changed since (its domain_fingerprint is different)."""
+    fingerprint = domain_fingerprint(prob_domain)
+    dr = getattr(prob_domain, "delete_relaxation", None)
+    if dr is None or dr.fingerprint != fingerprint:
+        dr = Delete_relaxation(prob_domain)
+        dr.fingerprint = fingerprint
+        prob_domain.delete_relaxation = dr
+    return dr
+
+# from library.stripsForwardPlanner import Forward_STRIPS
+# from library.searchMPP import SearcherMPP
+# from starcraft.starcraftProblem import problem_train_tank, domain_train_tank
+# hr = delete_relaxation(domain_train_tank)
+# SearcherMPP(Forward_STRIPS(problem_train_tank, hr.h_max)).search()  # optimal
+# SearcherMPP(Forward_STRIPS(problem_train_tank, hr.h_ff)).search()   # fewer expansions
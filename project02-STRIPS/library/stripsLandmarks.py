@@ -0,0 +1,182 @@
+# stripsLandmarks.py - Landmark-count heuristic and preferred operators for STRIPS
+
+from library.searchGeneric import FrontierPQ
+from library.searchMPP import SearcherMPP
+from library.stripsForwardPlanner import Forward_STRIPS, zero
+from library.stripsHeuristic import delete_relaxation
+
+class Landmark(object):
+    """A landmark is a disjunction of values of one feature,
+    at least one of which must be true at some point in every plan.
+    """
+    def __init__(self, feature, values):
+        self.feature = feature
+        self.values = values      # frozenset of values
+        self.parents = set()      # landmarks that must be true before this one
+        self.children = set()     # landmarks this one must be true before
+        self.is_goal = False
+        self.cost = 0             # cost of the cheapest action that achieves it
+
+    def holds(self, state_asst):
+        """True if the landmark is true in state_asst"""
+        return state_asst[self.feature] in self.values
+
+    def __repr__(self):
+        if len(self.values) == 1:
+            return f"{self.feature}={next(iter(self.values))}"
+        return f"{self.feature} in {set(self.values)}"
+
+def find_landmarks(prob_domain, initial_state, goal):
+    """returns the list of landmarks for reaching goal from initial_state.
+    The goal facts are landmarks. For a landmark that is false initially,
+    its first achievers are the actions that achieve it and are possible in
+    the relaxed planning graph built without any action that achieves it.
+    If every first achiever has a precondition on a feature, the values of
+    those preconditions form a landmark that must be true before it.
+    """
+    dr = delete_relaxation(prob_domain)
+    landmarks = {}    # (feature, values) -> Landmark
+    to_do = []
+    for (feat,val) in goal.items():
+        lm = Landmark(feat, frozenset([val]))
+        lm.is_goal = True
+        landmarks[(feat,lm.values)] = lm
+        to_do.append(lm)
+    while to_do:
+        lm = to_do.pop()
+        if lm.holds(initial_state):
+            continue
+        facts = {dr.fact_index.get((lm.feature,val)) for val in lm.values}
+        achievers = {a for (a,effs) in enumerate(dr.effects) if facts.intersection(effs)}
+        reached = dr.reachable(initial_state, excluded=achievers)
+        first = [dr.actions[a] for a in achievers
+                     if all(f in reached for f in dr.preconds[a])]
+        if not first:
+            continue      # unreachable: not a useful landmark
+        lm.cost = min(act.cost for act in first)
+        shared = set(first[0].preconds)
+        for act in first[1:]:
+            shared.intersection_update(act.preconds)
+        for feat in shared:
+            if feat == lm.feature:
+                continue
+            values = frozenset(act.preconds[feat] for act in first)
+            key = (feat,values)
+            if key not in landmarks:
+                landmarks[key] = Landmark(feat, values)
+                to_do.append(landmarks[key])
+            landmarks[key].children.add(lm)
+            lm.parents.add(landmarks[key])
+    return list(landmarks.values())
+
+class Landmark_STRIPS(Forward_STRIPS):
+    """A forward planning problem where the heuristic is the landmark count:
+    the cost of the landmarks that have not been accepted along the path to
+    a state, plus those accepted that are needed again. A landmark is
+    accepted when it becomes true after all of its parents are accepted.
+    If a state is reached by several paths, only the landmarks accepted on
+    all of them are accepted.
+    The heur function, if given, is combined with the landmark cost by max.
+    """
+    def __init__(self, planning_problem, heur=zero, compact=False, cache_size=0):
+        super().__init__(planning_problem, heur, compact, cache_size)
+        self.landmarks = find_landmarks(self.prob_domain,
+                                        planning_problem.initial_state, self.goal)
+        self.lm_number = {lm:i for (i,lm) in enumerate(self.landmarks)}
+        self.parent_mask = [sum(1<<self.lm_number[p] for p in lm.parents)
+                                for lm in self.landmarks]
+        self.child_mask = [sum(1<<self.lm_number[c] for c in lm.children)
+                                for lm in self.landmarks]
+        self.achieves = {}    # (feature,value) -> list of landmark numbers
+        for (i,lm) in enumerate(self.landmarks):
+            for val in lm.values:
+                self.achieves.setdefault((lm.feature,val),[]).append(i)
+        start = self.initial_state
+        self.accepted = {start: self.newly_accepted(start.assignment, 0)}
+
+    def newly_accepted(self, state_asst, accepted):
+        """returns accepted (a bit mask of landmark numbers) together with the
+        landmarks that are true in state_asst and whose parents are accepted"""
+        for (i,lm) in enumerate(self.landmarks):
+            if (not accepted & (1<<i) and accepted & self.parent_mask[i] == self.parent_mask[i]
+                    and lm.holds(state_asst)):
+                accepted |= 1<<i
+        return accepted
+
+    def neighbors(self, state):
+        """returns the arcs from state, recording the landmarks accepted
+        by each of the neighbors"""
+        arcs = super().neighbors(state)
+        accepted = self.accepted[state]
+        for arc in arcs:
+            acc = self.newly_accepted(arc.to_node.assignment, accepted)
+            if arc.to_node in self.accepted:
+                self.accepted[arc.to_node] &= acc
+            else:
+                self.accepted[arc.to_node] = acc
+        return arcs
+
+    def needed(self, state):
+        """returns the list of the numbers of landmarks still needed in state:
+        those not accepted, and those accepted but false that are goals or
+        must be true before a landmark that is not accepted."""
+        accepted = self.accepted[state]
+        state_asst = state.assignment
+        return [i for (i,lm) in enumerate(self.landmarks)
+                if not accepted & (1<<i)
+                   or ((lm.is_goal or self.child_mask[i] & ~accepted)
+                       and not lm.holds(state_asst))]
+
+    def heuristic(self, state):
+        """the cost of the needed landmarks, or heur if that is larger.
+        Only the value of heur is cached, as the landmarks needed depend
+        on the paths to the state found so far."""
+        return max(sum(self.landmarks[i].cost for i in self.needed(state)),
+                   super().heuristic(state))
+
+    def preferred_actions(self, state):
+        """returns the set of actions possible in state that make true
+        a needed landmark whose parents are all accepted"""
+        accepted = self.accepted[state]
+        next_lms = {i for i in self.needed(state)
+                    if accepted & self.parent_mask[i] == self.parent_mask[i]}
+        return {act for act in self.applicable_actions(state)
+                if any(i in next_lms
+                       for fv in act.effects.items()
+                       for i in self.achieves.get(fv,()))}
+
+class Preferred_SearcherMPP(SearcherMPP):
+    """A searcher with multiple-path pruning that, amongst paths with the
+    same value, expands first those whose last action is preferred
+    (see Landmark_STRIPS.preferred_actions).
+    If greedy is True, paths are ordered by heuristic value only
+    (greedy best-first search), otherwise by cost plus heuristic (A*).
+    """
+    def __init__(self, problem, greedy=False):
+        self.greedy = greedy
+        self.preferred_for = None   # the node the preferred actions are for
+        self.num_preferred = 0      # number of preferred paths added
+        super().__init__(problem)
+
+    def initialize_frontier(self):
+        self.frontier = FrontierPQ()     # the values are pairs
+
+    def path_value(self, path):
+        """(value, 0) for preferred paths and (value, 1) for the others"""
+        h = self.evaluate(path.end())
+        value = h if self.greedy else path.cost+h
+        if path.arc is None:
+            return (value, 0)
+        parent = path.initial.end()
+        if parent is not self.preferred_for:
+            self.preferred_for = parent
+            self.preferred = self.problem.preferred_actions(parent)
+        if path.arc.action in self.preferred:
+            self.num_preferred += 1
+            return (value, 0)
+        return (value, 1)
+
+# from starcraft.starcraftProblem import problem_train_tank
+# SearcherMPP(Landmark_STRIPS(problem_train_tank)).search()  # landmark count
+# Preferred_SearcherMPP(Landmark_STRIPS(problem_train_tank)).search()  # and preferred operators
+# Preferred_SearcherMPP(Landmark_STRIPS(problem_train_tank), greedy=True).search()
@@ -0,0 +1,205 @@
+# stripsPDB.py - Pattern database heuristics for STRIPS domains
+
+import hashlib
+import os
+import numpy as np
+from library.stripsProblem import domain_fingerprint
+
+class Pattern_database(object):
+    """The cost to reach a goal in the projection of a domain onto a
+    pattern (a tuple of features), for every abstract state.
+    An abstract state is numbered by the mixed-radix number of the codes
+    of the values of the pattern features; table[n] is the cost from
+    abstract state n (inf if the goal cannot be reached).
+    """
+    def __init__(self, prob_domain, pattern, goal, table=None):
+        """builds the database of pattern for goal in prob_domain.
+        If table is given (e.g., loaded from disk) it is used instead of
+        solving the abstract space."""
+        self.pattern = tuple(pattern)
+        self.values = [pattern_values(prob_domain, feat, goal) for feat in self.pattern]
+        self.codes = [{val:c for (c,val) in enumerate(vals)} for vals in self.values]
+        self.dims = tuple(len(vals) for vals in self.values)
+        self.size = int(np.prod(self.dims))
+        self.strides = [int(np.prod(self.dims[j+1:])) for j in range(len(self.dims))]
+        self.lookup = list(zip(self.pattern, self.strides, self.codes))
+        self.table = self.solve(prob_domain, goal) if table is None else table
+
+    def abstract_actions(self, prob_domain):
+        """returns the set of (preconds, effects, cost) triples of the
+        actions projected onto the pattern, where preconds and effects are
+        tuples of (pattern position, value code) pairs. Actions that do not
+        change a pattern feature are left out."""
+        position = {feat:j for (j,feat) in enumerate(self.pattern)}
+        result = set()
+        for act in prob_domain.actions:
+            effects = tuple((position[f], self.codes[position[f]][v])
+                            for (f,v) in act.effects.items() if f in position)
+            if effects:
+                preconds = tuple((position[f], self.codes[position[f]][v])
+                                 for (f,v) in act.preconds.items() if f in position)
+                result.add((preconds, effects, act.cost))
+        return result
+
+    def solve(self, prob_domain, goal):
+        """returns the table of abstract goal distances, found by
+        Bellman-Ford relaxation rather than a backward search: starting
+        from 0 at the goal states, the distances are lowered along every
+        abstract arc at once (with NumPy) until they no longer change.
+        Each pass is vectorized over all the arcs, which is faster in NumPy
+        than a node-at-a-time Dijkstra search in Python; the number of
+        passes is one more than the most arcs on a cheapest path."""
+        digits = np.unravel_index(np.arange(self.size), self.dims)
+        sources, targets, costs = [], [], []
+        for (preconds, effects, cost) in self.abstract_actions(prob_domain):
+            mask = np.ones(self.size, dtype=bool)
+            for (j,c) in preconds:
+                mask &= digits[j] == c
+            src = np.nonzero(mask)[0]
+            dst = src.copy()
+            for (j,c) in effects:
+                dst += (c - digits[j][src]) * self.strides[j]
+            moved = src != dst
+            sources.append(src[moved])
+            targets.append(dst[moved])
+            costs.append(np.full(np.count_nonzero(moved), cost, dtype=np.float32))
+        sources = np.concatenate(sources) if sources else np.zeros(0, dtype=np.intp)
+        targets = np.concatenate(targets) if targets else np.zeros(0, dtype=np.intp)
+        costs = np.concatenate(costs) if costs else np.zeros(0, dtype=np.float32)
+        goal_mask = np.ones(self.size, dtype=bool)
+        for (j,feat) in enumerate(self.pattern):
+            if feat in goal:
+                goal_mask &= digits[j] == self.codes[j][goal[feat]]
+        dist = np.full(self.size, np.inf, dtype=np.float32)
+        dist[goal_mask] = 0
+        while True:
+            new_dist = dist.copy()
+            np.minimum.at(new_dist, sources, dist[targets] + costs)
+            if np.array_equal(new_dist, dist):
+                return dist
+            dist = new_dist
+
+    def value(self, state_asst):
+        """returns the abstract cost to the goal from state_asst"""
+        index = 0
+        for (feat, stride, codes) in self.lookup:
+            code = codes.get(state_asst[feat])
+            if code is None:
+                return 0      # a value the database knows nothing about
+            index += code*stride
+        return float(self.table[index])
+
+def pattern_values(prob_domain, feat, goal):
+    """returns the list of the values of feat in the domain, in the actions
+    and in the goal, sorted so that the coding is the same in every run"""
+    values = set(prob_domain.feature_domain_dict.get(feat, ()))
+    for act in prob_domain.actions:
+        for asst in (act.preconds, act.effects):
+            if feat in asst:
+                values.add(asst[feat])
+    if feat in goal:
+        values.add(goal[feat])
+    return sorted(values, key=repr)
+
+def select_patterns(prob_domain, goal, max_size):
+    """returns a list of patterns, one for each goal feature, grown with the
+    features in the preconditions of the actions that change the pattern,
+    most frequent first, while the abstract space has at most max_size states."""
+    domain_size = {}
+    patterns = []
+    for goal_feat in goal:
+        pattern = [goal_feat]
+        size = len(pattern_values(prob_domain, goal_feat, goal))
+        added = True
+        while added:
+            added = False
+            counts = {}
+            for act in prob_domain.actions:
+                if any(f in act.effects for f in pattern):
+                    for f in act.preconds:
+                        if f not in pattern:
+                            counts[f] = counts.get(f,0)+1
+            for f in sorted(counts, key=lambda f: (-counts[f], repr(f))):
+                if f not in domain_size:
+                    domain_size[f] = len(pattern_values(prob_domain, f, goal))
+                if size*domain_size[f] <= max_size:
+                    pattern.append(f)
+                    size *= domain_size[f]
+                    added = True
+                    break
+        if pattern not in patterns:
+            patterns.append(pattern)
+    return patterns
+
+class PDB_heuristic(object):
+    """A heuristic for Forward_STRIPS, heur(state,goal), that is the maximum
+    of the values of the pattern databases for the goal. The databases for
+    a goal are built the first time the goal is seen and kept, so the same
+    object can be used for many goals over the same domain.
+    for_goal(goal) returns the function of the state for goal, so that
+    Forward_STRIPS looks the goal up once; a call heur(state,goal) looks it
+    up only when goal is not the last goal used.
+    If cache_dir is not None, the tables are saved there as .npy files
+    named by the domain fingerprint, pattern and goal, and later loaded
+    memory-mapped instead of being recomputed.
+    """
+    def __init__(self, prob_domain, patterns=None, max_size=10**5, cache_dir="pdb_cache"):
+        """patterns is a list of lists of features; by default they are
+        chosen for each goal by select_patterns with at most max_size
+        abstract states each"""
+        self.prob_domain = prob_domain
+        self.patterns = patterns
+        self.max_size = max_size
+        self.cache_dir = cache_dir
+        self.fingerprint = domain_fingerprint(prob_domain)
+        self.databases = {}   # frozenset of goal items -> list of Pattern_database
+        self.last = (None, None)   # the last goal called and its function
+        self.num_built = 0
+        self.num_loaded = 0
+
+    def __call__(self, state, goal):
+        if goal is not self.last[0]:
+            self.last = (goal, self.for_goal(goal))
+        return self.last[1](state)
+
+    def for_goal(self, goal):
+        """returns the heuristic function of the state for goal"""
+        key = frozenset(goal.items())
+        if key not in self.databases:
+            self.databases[key] = self.make_databases(goal)
+        databases = self.databases[key]
+        def heur(state):
+            return max((db.value(state) for db in databases), default=0)
+        return heur
+
+    def make_databases(self, goal):
+        """returns the list of Pattern_databases for goal"""
+        patterns = self.patterns or select_patterns(self.prob_domain, goal, self.max_size)
+        return [self.database(pattern, goal) for pattern in patterns]
+
+    def database(self, pattern, goal):
+        """returns the Pattern_database for pattern and goal, from the
+        cache if it has been saved there"""
+        if self.cache_dir is None:
+            self.num_built += 1
+            return Pattern_database(self.prob_domain, pattern, goal)
+        goal_part = sorted(((f,v) for (f,v) in goal.items() if f in pattern), key=repr)
+        name = hashlib.sha1(repr((self.fingerprint, list(pattern), goal_part)).encode()).hexdigest()
+        file_name = os.path.join(self.cache_dir, f"pdb_{name}.npy")
+        if os.path.exists(file_name):
+            self.num_loaded += 1
+            table = np.load(file_name, mmap_mode='r')
+            return Pattern_database(self.prob_domain, pattern, goal, table)
+        self.num_built += 1
+        db = Pattern_database(self.prob_domain, pattern, goal)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        temp_name = f"{file_name}.{os.getpid()}.tmp.npy"
+        np.save(temp_name, db.table)
+        os.replace(temp_name, file_name)   # other processes never see a partial file
+        return db
+
+# from library.stripsForwardPlanner import Forward_STRIPS
+# from library.searchMPP import SearcherMPP
+# from starcraft.starcraftProblem import problem_train_tank, domain_train_tank
+# pdb = PDB_heuristic(domain_train_tank)
+# SearcherMPP(Forward_STRIPS(problem_train_tank, pdb)).search()
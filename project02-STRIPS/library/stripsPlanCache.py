@@ -0,0 +1,118 @@
+# stripsPlanCache.py - A persistent cache of plans, keyed by domain, state and goal
+
+import hashlib
+import json
+import sqlite3
+from library.searchProblem import Path
+from library.stripsForwardPlanner import Forward_STRIPS
+from library.stripsProblem import domain_fingerprint
+
+def canonical(assignment):
+    """a string that is the same for equal feature:value dictionaries"""
+    return repr(sorted((repr(feat), repr(val)) for (feat, val) in assignment.items()))
+
+class Plan_cache(object):
+    """Plans stored in an SQLite database in file_name, keyed by the
+    fingerprint of the domain, the initial state, the goal and the
+    planner (a string that distinguishes planners that can find
+    different plans, e.g., optimal and greedy ones). A plan is stored as
+    the list of the names of its actions. At most max_entries plans are
+    kept; the least recently used are evicted first.
+    Replayed plans are Paths of States, or of Compact_states if compact
+    is True, as for Forward_STRIPS.
+    """
+    def __init__(self, file_name="plan_cache.sqlite", max_entries=10000):
+        self.file_name = file_name
+        self.max_entries = max_entries
+        self.connection = sqlite3.connect(file_name)
+        self.connection.execute("CREATE TABLE IF NOT EXISTS plans (key TEXT PRIMARY KEY,"
+                                " actions TEXT, cost REAL, last_used INTEGER)")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS plans_last_used"
+                                " ON plans (last_used)")
+        (last,) = self.connection.execute("SELECT MAX(last_used) FROM plans").fetchone()
+        self.last_used = last or 0   # the use counter, kept in memory
+        self.fingerprints = {}   # id(domain) -> (domain, number of actions, fingerprint)
+        self.hits = 0
+        self.misses = 0
+
+    def fingerprint(self, prob_domain):
+        """the fingerprint of prob_domain, computed once unless actions are added"""
+        entry = self.fingerprints.get(id(prob_domain))
+        if entry is None or entry[0] is not prob_domain or entry[1] != len(prob_domain.actions):
+            entry = (prob_domain, len(prob_domain.actions), domain_fingerprint(prob_domain))
+            self.fingerprints[id(prob_domain)] = entry
+        return entry[2]
+
+    def key(self, planning_problem, planner):
+        return hashlib.sha1(repr((self.fingerprint(planning_problem.prob_domain),
+                                  canonical(planning_problem.initial_state),
+                                  canonical(planning_problem.goal), planner)).encode()).hexdigest()
+
+    def next_use(self):
+        self.last_used += 1
+        return self.last_used
+
+    def get(self, planning_problem, planner="", compact=False):
+        """returns the Path of the cached plan for planning_problem, or None.
+        A plan that is no longer valid for the problem is removed."""
+        key = self.key(planning_problem, planner)
+        row = self.connection.execute("SELECT actions FROM plans WHERE key=?", (key,)).fetchone()
+        path = None if row is None else plan_path(planning_problem,
+                                                       json.loads(row[0]), compact)
+        with self.connection:
+            if path is None:
+                self.connection.execute("DELETE FROM plans WHERE key=?", (key,))
+            else:
+                self.connection.execute("UPDATE plans SET last_used=? WHERE key=?",
+                                        (self.next_use(), key))
+        return path
+
+    def put(self, planning_problem, path, planner=""):
+        """stores the plan of path, a Path of the Forward_STRIPS problem for planning_problem"""
+        names = [arc.action.name for arc in path.arcs()]
+        with self.connection:
+            self.connection.execute("INSERT OR REPLACE INTO plans VALUES (?,?,?,?)",
+                (self.key(planning_problem, planner), json.dumps(names), path.cost, self.next_use()))
+            self.connection.execute("DELETE FROM plans WHERE key IN (SELECT key FROM plans"
+                " ORDER BY last_used DESC LIMIT -1 OFFSET ?)", (self.max_entries,))
+
+    def solve(self, planning_problem, search, planner="", compact=False):
+        """returns the cached Path for planning_problem, or the result of
+        search(planning_problem) (which is cached if it is not None).
+        compact should be True if search returns paths of Compact_states."""
+        path = self.get(planning_problem, planner, compact)
+        if path is not None:
+            self.hits += 1
+            return path
+        self.misses += 1
+        path = search(planning_problem)
+        if path is not None:
+            self.put(planning_problem, path, planner)
+        return path
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM plans").fetchone()[0]
+
+    def __repr__(self):
+        return f"Plan_cache({self.file_name}: {len(self)} plans, {self.hits} hits, {self.misses} misses)"
+
+def plan_path(planning_problem, action_names, compact=False):
+    """returns the Path of States (Compact_states if compact) from doing
+    the actions named action_names from the initial state of
+    planning_problem, or None if one is not possible or the goal is not
+    achieved at the end"""
+    problem = Forward_STRIPS(planning_problem, compact=compact)
+    path = Path(problem.start_node())
+    for name in action_names:
+        arc = next((arc for arc in problem.neighbors(path.end())
+                        if arc.action.name == name), None)
+        if arc is None:
+            return None
+        path = Path(path, arc)
+    return path if problem.is_goal(path.end()) else None
+
+# from library.searchMPP import SearcherMPP
+# from starcraft.starcraftProblem import problem_train_tank
+# cache = Plan_cache()
+# cache.solve(problem_train_tank, lambda prob: SearcherMPP(Forward_STRIPS(prob)).search(), "A*")
+# cache.solve(problem_train_tank, lambda prob: SearcherMPP(Forward_STRIPS(prob)).search(), "A*")  # replayed
@@ -0,0 +1,162 @@
+# stripsPortfolio.py - Running several planner configurations in parallel
+
+import json
+import multiprocessing
+import os
+import queue
+import time
+from library.display import Displayable
+from library.searchMPP import SearcherMPP
+from library.stripsForwardPlanner import Forward_STRIPS, zero
+
+class Planner_config(object):
+    """A planner configuration: a searcher class applied to a search
+    problem built from a planning problem.
+    * name identifies the configuration
+    * searcher is the searcher class, e.g., SearcherMPP
+    * heur(state,goal) is the heuristic function
+    * problem_class builds the search problem, e.g., Forward_STRIPS
+    * searcher_args are extra keyword arguments for the searcher
+    The searcher, heuristic and problem class must be picklable (defined
+    at the top level of a module) to be run in another process.
+    """
+    def __init__(self, name, searcher=SearcherMPP, heur=zero,
+                 problem_class=Forward_STRIPS, searcher_args=None):
+        self.name = name
+        self.searcher = searcher
+        self.heur = heur
+        self.problem_class = problem_class
+        self.searcher_args = searcher_args or {}
+
+    def make_searcher(self, planning_problem):
+        return self.searcher(self.problem_class(planning_problem, self.heur),
+                             **self.searcher_args)
+
+    def __repr__(self):
+        return self.name
+
+def run_config(config, planning_problem, results):
+    """runs config on planning_problem and puts
+    (name, path, num_expanded, time, error) on the results queue,
+    where error is None, or the exception raised as a string"""
+    start_time = time.perf_counter()
+    try:
+        searcher = config.make_searcher(planning_problem)
+        searcher.max_display_level = 0
+        path = searcher.search()
+        results.put((config.name, path, searcher.num_expanded,
+                     time.perf_counter() - start_time, None))
+    except Exception as error:
+        results.put((config.name, None, 0, time.perf_counter() - start_time, repr(error)))
+
+class Portfolio_planner(Displayable):
+    """Runs a portfolio of planner configurations on a planning problem,
+    each in its own process, at most max_workers at a time (by default
+    all of them, as which will be fast is not known in advance).
+    solve() returns the first plan found, or with best=True the lowest-cost
+    plan found by the deadline; the other processes are then stopped.
+    The number of wins of each configuration is kept (and saved to
+    stats_file if it is given) and configurations with more wins are
+    started first.
+    """
+    poll_interval = 0.5   # seconds between checks that the workers are alive
+
+    def __init__(self, configs, max_workers=None, stats_file=None):
+        self.configs = list(configs)
+        self.max_workers = max_workers or len(self.configs)
+        self.stats_file = stats_file
+        self.wins = {config.name:0 for config in self.configs}
+        if stats_file is not None and os.path.exists(stats_file):
+            with open(stats_file) as f:
+                self.wins.update(json.load(f))
+        self.results = []   # (name, path, num_expanded, time, error) of the last solve()
+        self.winner = None
+
+    def ordered_configs(self):
+        """returns the configurations, most wins first"""
+        return sorted(self.configs, key=lambda c: -self.wins.get(c.name,0))
+
+    def solve(self, planning_problem, timeout=None, best=False):
+        """returns a path for planning_problem, or None if no configuration
+        finds one (within timeout seconds if timeout is not None).
+        If best is False the first path found is returned; otherwise the
+        lowest-cost path found once all have finished or timeout is reached.
+        A configuration that raises an exception or whose process dies
+        counts as finding no path; its error is in self.results.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        results = multiprocessing.Queue()
+        to_start = self.ordered_configs()
+        running = {}   # name -> Process
+        self.results = []
+        self.winner = None
+        best_path = None
+        started = {}   # name -> time started
+        try:
+            while to_start or running:
+                while to_start and len(running) < self.max_workers:
+                    config = to_start.pop(0)
+                    proc = multiprocessing.Process(target=run_config,
+                                                   args=(config, planning_problem, results),
+                                                   daemon=True)
+                    proc.start()
+                    running[config.name] = proc
+                    started[config.name] = time.perf_counter()
+                wait = None if deadline is None else deadline - time.monotonic()
+                if wait is not None and wait <= 0:
+                    break
+                try:
+                    result = results.get(timeout=self.poll_interval if wait is None
+                                                 else min(wait, self.poll_interval))
+                except queue.Empty:
+                    # a process that died without a result can only be
+                    # detected by its exit code
+                    dead = [name for (name, proc) in running.items() if not proc.is_alive()]
+                    if not dead:
+                        continue
+                    try:
+                        result = results.get(timeout=self.poll_interval)  # sent just before exiting
+                    except queue.Empty:
+                        name = dead[0]
+                        result = (name, None, 0, time.perf_counter() - started[name],
+                                  f"exit code {running[name].exitcode}")
+                (name, path, num_expanded, elapsed, error) = result
+                running.pop(name).join()
+                self.results.append(result)
+                if error is not None:
+                    self.display(1, f"{name} failed: {error}")
+                else:
+                    self.display(2, f"{name}: cost {path.cost if path else None},",
+                                 num_expanded, f"expanded in {elapsed:.3f}s")
+                if path is not None and (best_path is None or path.cost < best_path.cost):
+                    best_path = path
+                    self.winner = name
+                    if not best:
+                        break
+        finally:
+            for proc in running.values():
+                proc.terminate()
+                proc.join()
+        if self.winner is not None:
+            self.wins[self.winner] = self.wins.get(self.winner,0) + 1
+            self.save_stats()
+        self.display(1, f"Winner: {self.winner}" if self.winner else "No plan found.")
+        return best_path
+
+    def save_stats(self):
+        """saves the number of wins of each configuration to stats_file"""
+        if self.stats_file is not None:
+            with open(self.stats_file, "w") as f:
+                json.dump(self.wins, f)
+
+# from library.stripsHeuristic import delete_relaxation
+# from library.stripsLandmarks import Landmark_STRIPS, Preferred_SearcherMPP
+# from starcraft.starcraftProblem import problem_train_tank, domain_train_tank
+# hr = delete_relaxation(domain_train_tank)
+# portfolio = Portfolio_planner([Planner_config("A* zero"),
+#                                Planner_config("A* h_max", heur=hr.h_max),
+#                                Planner_config("greedy landmarks", Preferred_SearcherMPP,
+#                                               problem_class=Landmark_STRIPS,
+#                                               searcher_args={'greedy':True})])
+# portfolio.solve(problem_train_tank)
+# portfolio.solve(problem_train_tank, timeout=10, best=True)
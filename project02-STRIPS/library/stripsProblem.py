@@ -8,6 +8,8 @@
 # Attribution-NonCommercial-ShareAlike 4.0 International License.
 # See: https://creativecommons.org/licenses/by-nc-sa/4.0/deed.en
 
+import hashlib
+
 class Strips(object):
     def __init__(self, name, preconds, effects, cost=1):
         """
@@ -50,4 +52,17 @@ class Planning_problem(object):
         self.initial_state = initial_state
         self.goal = goal
 
+def domain_fingerprint(prob_domain):
+    """returns a hex string that identifies prob_domain by its content:
+    the features with their domains, and the actions with their
+    preconditions, effects and costs. Equal domains built in different
+    runs have the same fingerprint."""
+    h = hashlib.sha1()
+    for feat in sorted(prob_domain.feature_domain_dict, key=repr):
+        h.update(repr((feat, sorted(map(repr, prob_domain.feature_domain_dict[feat])))).encode())
+    for act in prob_domain.actions:
+        h.update(repr((act.name, sorted(act.preconds.items(), key=repr),
+                       sorted(act.effects.items(), key=repr), act.cost)).encode())
+    return h.hexdigest()
+
 boolean = {False, True}
\ No newline at end of file
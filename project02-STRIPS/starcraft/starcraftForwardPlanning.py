@@ -2,51 +2,65 @@ import time
 import pandas as pd
 
 from library.searchMPP import SearcherMPP
+from library.searchStats import measure
 from starcraft.starcraftProblem import *
-from library.stripsForwardPlanner import Forward_STRIPS
+from library.stripsForwardPlanner import Forward_STRIPS, goal_specialized
+from library.stripsLandmarks import Landmark_STRIPS, Preferred_SearcherMPP
+from library.stripsPlanCache import Plan_cache
+from library.stripsChain import Chained_planner
 
 #heuristics
 def h_minerals(state, goal):
     return 10 if not state['scv_has_minerals'] else 0
 
-def h_building_needed(state, goal):
-
+@goal_specialized
+def h_building_needed(goal):
+    """the buildings that must be built for goal are found once per goal"""
     buildings = ['supply_depot', 'barracks', 'factory', 'starport', 'fusion_core']
     units = ['marine', 'tank', 'wraith', 'battlecruiser']
 
     highest = max(max((idx for idx, building in enumerate(buildings) if facility_is_built(building) in goal), default=0),
                   max((idx for idx, unit in enumerate(units) if is_unit_trained(unit) in goal), default=0) + 1)
 
-    buildings_needed = buildings[0:highest]
-
-    missing_buildings = sum(1 for building in buildings_needed if state[facility_is_built(building)] is None)
+    buildings_needed = [facility_is_built(building) for building in buildings[0:highest]]
 
-    return missing_buildings * 2
+    def h(state):
+        missing_buildings = sum(1 for feat in buildings_needed if state[feat] is None)
+        return missing_buildings * 2
+    return h
 
 
-def h_combined(state, goal):
-    return max(h_minerals(state, goal), h_building_needed(state, goal))
+@goal_specialized
+def h_combined(goal):
+    building_needed = h_building_needed.for_goal(goal)
+    return lambda state: max(h_minerals(state, goal), building_needed(state))
 
 #tests
 
-def get_time(forward_strips):
-    start_time = time.perf_counter()
-    SearcherMPP(forward_strips).search()
-    stop_time = time.perf_counter()
-    elapsed_time = stop_time - start_time
-    return elapsed_time
+def get_time(forward_strips, searcher=SearcherMPP):
+    stats = measure(searcher(forward_strips), timing=False)
+    return stats.search_time, stats.expanded
 
 def run_with_stats(tasks):
 
-    df = pd.DataFrame(columns=['Problem name','Execution time(s) without heuristic','Execution time(s) with heuristic'])
+    df = pd.DataFrame(columns=['Problem name','Execution time(s) without heuristic','Execution time(s) with heuristic',
+                               'Execution time(s) with landmarks',
+                               'Expanded without heuristic','Expanded with heuristic','Expanded with landmarks'])
 
     for name, task in tasks.items():
-        time_without = get_time(Forward_STRIPS(task))
-        time_with = get_time(Forward_STRIPS(task, h_combined))
+        time_without, expanded_without = get_time(Forward_STRIPS(task))
+        time_with, expanded_with = get_time(Forward_STRIPS(task, h_combined))
+        # greedy search on the landmark count, expanding preferred operators first
+        time_landmarks, expanded_landmarks = get_time(Landmark_STRIPS(task),
+                                                      lambda prob: Preferred_SearcherMPP(prob, greedy=True))
 
         new_row = pd.DataFrame([{'Problem name': name,
                                  'Execution time(s) without heuristic': time_without,
-                                 'Execution time(s) with heuristic': time_with}])
+                                 'Execution time(s) with heuristic': time_with,
+                                 'Execution time(s) with landmarks': time_landmarks,
+                                 'Expanded without heuristic': expanded_without,
+                                 'Expanded with heuristic': expanded_with,
+                                 'Expanded with landmarks': expanded_landmarks}])
 
         df = pd.concat([df, new_row], ignore_index=True)
 
@@ -57,7 +71,14 @@ def run_with_stats(tasks):
 # results = run_with_stats(problems)
 # results.to_csv('results1.csv')
 
-def run_with_subgoals(problems_list):
+def run_with_subgoals(problems_list, cache_file=None):
+    """solves the subgoals of each problem in turn. If cache_file is
+    given (e.g., "plan_cache.sqlite"), the plans for the subgoals are kept
+    in a Plan_cache there, so a segment solved before, in this or an
+    earlier run, is replayed (and its time is not the time to search).
+    The problems with the same domain share a Chained_planner."""
+    cache = Plan_cache(cache_file) if cache_file else None
+    planners = {}   # id(domain) -> Chained_planner
 
     results = []
 
@@ -81,15 +102,15 @@ def run_with_subgoals(problems_list):
         # time_no_heur = end_time - start_time
 
         # RUN WITH HEURISTIC
-        state_heur = initial_state
+        if id(domain) not in planners:
+            planners[id(domain)] = Chained_planner(domain, h_combined, plan_cache=cache,
+                                                   planner_name="A* h_combined")
+        planner = planners[id(domain)]
+        planner.max_display_level = 0
+        hits = cache.hits if cache is not None else 0
         start_time = time.time()
-        for goal in subgoals:
-            problem = Planning_problem(domain, state_heur, goal)
-            result = SearcherMPP(Forward_STRIPS(problem, h_combined)).search()
-            if result is None:
-                print(f"[HEUR] No solution for subgoal: {goal}")
-                break
-            state_heur = result.end().assignment
+        if planner.solve(initial_state, subgoals) is None and planner.segments:
+            print(f"[HEUR] No solution for subgoal: {planner.segments[-1]['goal']}")
         end_time = time.time()
         time_with_heur = end_time - start_time
 
@@ -97,13 +118,17 @@ def run_with_subgoals(problems_list):
         results.append({
             "Problem": name,
             # "Time_no_heuristic": time_no_heur,
-            "Time_with_heuristic": time_with_heur
+            "Time_with_heuristic": time_with_heur,
+            "Expanded_per_segment": [segment['expanded'] for segment in planner.segments],
+            "Expanded_with_heuristic": planner.total_expanded(),
+            "Segments_from_cache": (cache.hits if cache is not None else 0) - hits
         })
 
     df = pd.DataFrame(results)
     return df
 
 # results4 = run_with_subgoals(problems_with_subgoals)
+# results4 = run_with_subgoals(problems_with_subgoals, cache_file="plan_cache.sqlite")
 # results4.to_csv('results4.csv')
 
 results5 = run_with_subgoals(hard_problems_with_subgoals)